@@ -16,6 +16,8 @@ Absorption rates:
 Initialcondition: HOw much of a chemical is present at birth, and the cost of reproduction
 """
 
+from Organ import PARAM_SLOTS
+
 REACTION_MAX = 4
 
 class BioChemGene:
@@ -29,6 +31,12 @@ class BioChemGene:
         self._activation_function = function
         self._func_name = name
 
+    def get_activation_function(self):
+        """
+        Returns the activation function. Decoded genes get theirs from get_activation, so genes with the same function and params share one
+        """
+        return self._activation_function
+
     def get_type(self):
         return self._type
 
@@ -62,12 +70,12 @@ class Receptor(BioChemGene):
         else:
             self._multiplier = 1
             
-    def set_parameter(self, name, parameter):
+    def set_parameter(self, slot):
         """
-        Sets what this gene can adjust in the organ. Presently needs to be passed a function from the organ, such as organ.get_rate() or organ.get_health(), these are then averaged over all receptors in organ
+        Sets what this gene can adjust in the organ, as the parameter's slot (Organ.HEALTH, REACTION_RATE or ACT_RATE). Outputs are averaged over all receptors in the organ adjusting that slot
         """
-        self._param_name = name
-        self._parameter = parameter
+        self._slot = slot
+        self._param_name = PARAM_SLOTS[slot]
 
     def set_chemical(self, chemical):
         """
@@ -75,6 +83,15 @@ class Receptor(BioChemGene):
         """
         self._chemical = chemical
 
+    def get_chemical(self):
+        return self._chemical
+
+    def get_param_name(self):
+        return self._param_name
+
+    def get_slot(self):
+        return self._slot
+
     def set_activation_function(self, name, function):
         """
         Sets the function that controls output, should already be parameterized if needed before assignment. Parameters are function specific and read from genome.
@@ -95,7 +112,7 @@ class Receptor(BioChemGene):
         """
         outputs signal to the parameter it should effect
         """
-        self._parameter(self.get_output())
+        self._organ.receive(self._slot, self.get_output())
 
     def describe(self):
         """
@@ -114,24 +131,36 @@ class Emitter(BioChemGene):
     Reads a parameter from the host organ, and outputs a specific chemical with a strength modified by organ health
     """
 
-    def set_parameter(self, name, parameter):
+    def set_parameter(self, slot):
         """
-        Sets the organs attribute to monitor
+        Sets the organs attribute to monitor, as the parameter's slot
         """
-        self._param_name = name
-        self._parameter = parameter
+        self._slot = slot
+        self._param_name = PARAM_SLOTS[slot]
 
     def set_chemical(self, chemical):
         self._chemical = chemical
 
+    def get_chemical(self):
+        return self._chemical
+
+    def get_param_name(self):
+        return self._param_name
+
+    def get_slot(self):
+        return self._slot
+
     def set_output_rate(self, rate):
         """
         Determines how much is released by default. I'm thinking a number between 0-10, mutations can increase? Outputs units, rather than concentrations
         """
         self._rate = (rate+1)/5
 
+    def get_output_rate(self):
+        return self._rate
+
     def read_param(self):
-        return self._organ.get_parameter(self._param_name)
+        return self._organ.get_param(self._slot)
 
     def get_output_amt(self):
         return self._activation_function(self.read_param()) * self._rate
@@ -171,6 +200,9 @@ class Reaction(BioChemGene):
         """
         self._chems = list
 
+    def get_chems_and_coefficients(self):
+        return self._chems
+
     def get_equation_params(self):
         return (self._num_of_chems_left, self._num_of_chems_right)
         
@@ -178,7 +210,6 @@ class Reaction(BioChemGene):
         for i in range(self._num_of_chems_left):
             chem = self._chems[i]
             q = self._organ.get_chem_quant(chem[1])
-            print(chem)
             if q < chem[0]*(REACTION_MAX)/64:
                 return False
         return True
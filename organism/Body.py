@@ -4,64 +4,172 @@ Creates a simple organism for prototyping purposes
 
 from utilities import *
 import Chemicals
+from Reactions import ReactionTable
+import numpy as np
 import random
 
+ROLL_BLOCK = 1024 # Most steps run draws activation rolls for at once, which bounds the memory a long run uses
+
 class Body:
 
     def __init__(self, genome=None):
         self._id = generate_id()
-        self._chems = {chem: 0 for chem in Chemicals.CHEMS}
-        self._concentrations = {chem: 0 for chem in Chemicals.CHEMS}
+        # Quantities and concentrations are indexed by chemical id
+        self._chems = np.zeros(Chemicals.NUM_CHEMS)
+        self._concentrations = np.zeros(Chemicals.NUM_CHEMS)
+        self.make_views()
         self._organs = []
         self._genome = genome
         self._dna_head = None
+        self._reactions = None
+        self._batched_reactions = False
+        self._chemical_writes = 0
+
+    def make_views(self):
+        """
+        Single chemicals are read and written through memoryviews of the arrays, which index like a list (plain floats, no NumPy scalars) while sharing the arrays' memory
+        """
+        self._chem_view = memoryview(self._chems)
+        self._concentration_view = memoryview(self._concentrations)
+
+    def __getstate__(self):
+        # memoryviews can't be copied or pickled, so rebuild them instead
+        state = self.__dict__.copy()
+        del state['_chem_view']
+        del state['_concentration_view']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.make_views()
         
     def add_organ(self, organ):
         self._organs.append(organ)
+        self._reactions = None
+
+    def build_reactions(self):
+        """
+        Builds the stoichiometry table of every reaction gene (decoders do this once the organism is finished)
+        """
+        self._reactions = ReactionTable.from_organs(self._organs)
+
+    def get_reactions(self):
+        if self._reactions is None:
+            self.build_reactions()
+        return self._reactions
+
+    def set_batched_reactions(self, enabled=True):
+        """
+        Opt in to resolving the reactions of every organ activated in a step together, once the other genes have run, instead of each one in gene order as its organ activates. See ReactionTable for how competing reactions are ordered
+        """
+        self._batched_reactions = enabled
 
     def activate_organs(self):
-        for organ in self._organs:
-            roll = random.random()
-            if roll <= organ.get_act_rate():
-                organ.activate_organ()
+        self.activate_with_rolls([random.random() for _ in self._organs])
+
+    def activate_with_rolls(self, rolls):
+        """
+        The same as activate_organs, but with one roll per organ given instead of drawn from random
+        """
+        if self._batched_reactions:
+            active = [roll <= organ.get_act_rate() for organ, roll in zip(self._organs, rolls)]
+            for organ, activated in zip(self._organs, active):
+                if activated:
+                    organ.activate_organ(react=False)
+            self.get_reactions().react(self._chems, active)
+        else:
+            for organ, roll in zip(self._organs, rolls):
+                if roll <= organ.get_act_rate():
+                    organ.activate_organ()
         self.calc_concentrations()
 
+    def run(self, steps, rng=None, trace=False):
+        """
+        Runs activate_organs steps times, with the activation rolls drawn from a NumPy Generator a block of steps at a time instead of one random() call per organ per step.
+        With trace, returns (chemicals, health): a steps x chemicals array of the quantities and a steps x organs array of the organs' health, each row as of the end of that step
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        if trace:
+            chemicals = np.zeros((steps, Chemicals.NUM_CHEMS))
+            health = np.zeros((steps, len(self._organs)))
+        step = 0
+        while step < steps:
+            block = min(ROLL_BLOCK, steps - step)
+            # tolist gives plain floats, which compare with the act rates quicker than NumPy scalars
+            for rolls in rng.random((block, len(self._organs))).tolist():
+                self.activate_with_rolls(rolls)
+                if trace:
+                    chemicals[step] = self._chems
+                    health[step] = [organ.get_health() for organ in self._organs]
+                step += 1
+        if trace:
+            return chemicals, health
+
     def calc_concentrations(self):
-        total = 0
-        for key, val in self._chems.items():
-            total += val
+        # Summing through the view is quicker than NumPy for so few chemicals, and adds them in the same order as always
+        total = sum(self._chem_view)
         if total == 0:
             total = 1
-        self._concentrations = {chem: val/total for chem, val in self._chems.items()}
+        np.divide(self._chems, total, out=self._concentrations)
 
     def get_concentration(self, chemical):
         try:
-            return self._concentrations[chemical]
+            return self._concentration_view[chemical]
         except:
             print("\n!!!!!! An error occured !!!! An invalid chemical was requested!\n")
             return 0
 
+    def get_concentrations(self):
+        """
+        Returns the array of every chemical's concentration, as of the last calc_concentrations
+        """
+        return self._concentrations
+
+    def get_chemicals(self):
+        """
+        Returns the array of every chemical's quantity (not a copy)
+        """
+        return self._chems
+
     def get_chemical(self,chemical):
-        return self._chems[chemical]
+        return self._chem_view[chemical]
+
+    def get_chemical_writes(self):
+        """
+        Returns how many times add_chemical or rem_chemical has been called, so watchers (like a SteadyStateMonitor) can tell when the chemicals were changed
+        """
+        return self._chemical_writes
 
     def add_chemical(self, chemical, amount):
+        self._chemical_writes += 1
         try:
-            self._chems[chemical] += amount
+            self._chem_view[chemical] += amount
         except:
             print("\n!!!!!! An error occured !!!! An invalid chemical was added to the body\n")
             return
 
     def rem_chemical(self, chemical, amount):
+        self._chemical_writes += 1
         try:
-            self._chems[chemical] -= amount
-            if self._chems[chemical] < 0:
-                self._chems[chemical] = 0
+            self._chem_view[chemical] -= amount
+            if self._chem_view[chemical] < 0:
+                self._chem_view[chemical] = 0
         except:
             print("\n!!!!!! An error occured !!!! An invalid chemical was removed from the body the body\n")
             return
 
     def set_dna_head(self, node):
         self._dna_head = node
+
+    def get_dna_head(self):
+        return self._dna_head
+
+    def set_genome(self, genome):
+        """
+        Keeps the genome the body was decoded from, for when it has no nodes (no organs were found)
+        """
+        self._genome = genome
         
     def get_genome(self):
         if self._dna_head is None:
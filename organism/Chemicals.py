@@ -1,2 +1,3 @@
 # placeholder for more sophisticated chemical types.
 CHEMS = [i for i in range(16)]
+NUM_CHEMS = len(CHEMS) # Chemicals are their own index into arrays of chemical state
@@ -1,4 +1,12 @@
 # handles reading a genome
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+import os
+import sys
+import numpy as np
 from Body import *
 from Organ import *
 from BioChemGene import *
@@ -23,7 +31,8 @@ class Decoder:
         Initialize to begin reading a dna strand
         """
         self._genome = None
-        self._current_pos = 1
+        self._length = 0
+        self._current_pos = 0
         self._current_organism = Body()
         self._current_organ = None
         self._current_gene = None
@@ -32,13 +41,10 @@ class Decoder:
 
     def set_genome(self, genome):
         """
-        Sets the active genome
+        Sets the active genome, either a PackedGenome or the byte string form
         """
-
-        self._genome = b'1' + genome # prepend a 1 to prevent leading zero discrepensies
-        self._bin_genome = int(genome.decode(),2)
-        self._leading_zeroes = len(self._genome)-self._bin_genome.bit_length()
-
+        self._genome = pack_genome(genome)
+        self._length = len(self._genome)
         
     def finish_organism(self):
         """
@@ -47,9 +53,11 @@ class Decoder:
         if self._current_organ is not None:
             self._current_organism.add_organ(self._current_organ)
         creature = self._current_organism
+        creature.set_genome(self._genome)
+        creature.build_reactions()
         self._current_organism = Body()
         self._genome = None
-        self._current_pos = 1
+        self._current_pos = 0
         self._current_organ = None
         self._current_gene = None
         return creature
@@ -62,14 +70,13 @@ class Decoder:
             pos = self._current_pos
         if length == 0:
             return
-        if pos >= len(self._genome):
-            self._current_pos = len(self._genome)
+        if pos >= self._length:
+            self._current_pos = self._length
             return 0
-        if pos + length >= len(self._genome):
-            self._current_pos = len(self._genome)
+        if pos + length >= self._length:
+            self._current_pos = self._length
             return 0
-        mask = ((1 << length) -1) << len(self._genome)-(length + pos)
-        val = (mask & self._bin_genome) >> len(self._genome)-(length+pos)
+        val = self._genome.read(pos, length)
         if pos == self._current_pos:
             self._current_pos += length
         return val
@@ -78,7 +85,7 @@ class Decoder:
         """
         Continually reads the genome, constructing an organism as it goes.
         """
-        while self._current_pos < len(self._genome) - 5:
+        while self._current_pos < self._length - 5:
             read_val = self.read_at_pos()
             # If the gene start code was encountered begin constructing a gene
             if read_val in GENE_OPCODES and self._current_organ is not None:
@@ -134,16 +141,11 @@ class Decoder:
         # If the function needs parameters, then read each one as needed
         for param in func_read_lengths:
             params.append(self.read_at_pos(length = param))
-        if params:
-            function = functions[func](*params)
-        else:
-            function = functions[func]()
-        self._current_gene.set_activation(func_name, function)
+        self._current_gene.set_activation(func_name, get_activation(func, params))
 
         # Now handle the other parameters of the gene
         val = int(self.read_at_pos(length = 4) % self._current_organ.get_param_numbers())
-        p=  self._current_organ._parameters[val]
-        self._current_gene.set_parameter(p[0], p[1])
+        self._current_gene.set_parameter(self._current_organ.get_param_at_index(val))
         val = int(self.read_at_pos(length = 4))
         self._current_gene.set_chemical(val)
         self._current_organ.add_gene(self._current_gene)
@@ -162,190 +164,555 @@ class Decoder:
         self._current_gene.set_chems_and_coefficients(chems)
         self._current_organ.add_gene(self._current_gene)
         
+def frame_values(genome, length=NORMAL_READ_LENGTH):
+    """
+    Returns a NumPy array holding the value of the length bit frame that starts at every position of the genome (the last length-1 positions have no full frame and are left out)
+    """
+    bits = genome.to_array().astype(np.int32)
+    count = len(bits) - length + 1
+    if count <= 0:
+        return np.zeros(0, dtype=np.int32)
+    values = np.zeros(count, dtype=np.int32)
+    for i in range(length):
+        values <<= 1
+        values |= bits[i:i + count]
+    return values
+
+def scan_opcodes(genome, length=NORMAL_READ_LENGTH):
+    """
+    Finds every position where an organ or gene opcode could be read in one pass over the genome.
+    A reading frame only ever lands on positions with the same remainder mod length until a structure is read, so candidates are split up by remainder. Returns (organ positions, organ or gene positions), each a list of sorted lists indexed by remainder
+    """
+    values = frame_values(genome, length)
+    organs = (values >= ORGAN_LOWER_LIMIT) & (values <= ORGAN_UPPER_LIMIT)
+    genes = (values >= GENE_LOWER_LIMIT) & (values <= GENE_UPPER_LIMIT)
+    return positions_by_remainder(organs, length), positions_by_remainder(organs | genes, length)
+
+def positions_by_remainder(mask, length):
+    """
+    Splits the positions where mask is True into length sorted lists, one for each remainder mod length
+    """
+    padded = np.zeros(-(-len(mask) // length) * length, dtype=bool)
+    padded[:len(mask)] = mask
+    # Transposing puts each remainder in its own row, and nonzero walks the rows in order
+    remainders, frames = np.nonzero(padded.reshape(-1, length).T)
+    positions = (frames * length + remainders).tolist()
+    bounds = np.searchsorted(remainders, np.arange(length + 1)).tolist()
+    return [positions[bounds[r]:bounds[r + 1]] for r in range(length)]
+
+MAX_SUMMARY_ORGANS = 64
+# One row per genome with the counts analyze_organism reports. Per organ counts only have room for the first MAX_SUMMARY_ORGANS organs, the totals count every organ.
+SUMMARY_DTYPE = np.dtype([
+    ('organ_count', np.int32),
+    ('gene_count', np.int32),
+    ('receptor_count', np.int32),
+    ('emitter_count', np.int32),
+    ('reaction_count', np.int32),
+    ('genes', np.int16, (MAX_SUMMARY_ORGANS,)),
+    ('receptors', np.int16, (MAX_SUMMARY_ORGANS,)),
+    ('emitters', np.int16, (MAX_SUMMARY_ORGANS,)),
+])
+
+def summarize_template(template, row=None):
+    """
+    Counts the organs and genes (by type) that the organism built from template would have, without building it. Fills in row if given (e.g. one row of a SUMMARY_DTYPE array), otherwise returns a new 0-d SUMMARY_DTYPE array
+    """
+    if row is None:
+        row = np.zeros((), dtype=SUMMARY_DTYPE)
+    genes = []
+    receptors = []
+    emitters = []
+    reactions = 0
+    for record in template[0]:
+        if record[0] == 'organ':
+            genes.append(0)
+            receptors.append(0)
+            emitters.append(0)
+            continue
+        values = record[4]
+        type = values[0]
+        if type == 2:
+            # A reaction cut off by the end of the genome is never added to its organ
+            if len(values) > 1 and values[1] is None:
+                continue
+            reactions += 1
+        elif type == 1:
+            emitters[-1] += 1
+        else:
+            receptors[-1] += 1
+        genes[-1] += 1
+    count = min(len(genes), MAX_SUMMARY_ORGANS)
+    row['organ_count'] = len(genes)
+    row['gene_count'] = sum(genes)
+    row['receptor_count'] = sum(receptors)
+    row['emitter_count'] = sum(emitters)
+    row['reaction_count'] = reactions
+    row['genes'][:count] = genes[:count]
+    row['receptors'][:count] = receptors[:count]
+    row['emitters'][:count] = emitters[:count]
+    return row
+
+def summarize_genomes(genomes, decoder=None):
+    """
+    Summarizes a list of genomes into a SUMMARY_DTYPE array, one row per genome. This walks the same grammar as decoding but never constructs organisms, organs or genes, so it is much faster than decoding with analyze_organism
+    """
+    if decoder is None:
+        decoder = DecoderLinkedList()
+    genomes = list(genomes)
+    rows = np.zeros(len(genomes), dtype=SUMMARY_DTYPE)
+    for i, genome in enumerate(genomes):
+        decoder.set_genome(genome)
+        decoder.read_summary(rows[i])
+    return rows
+
+def template_size(template):
+    """
+    Rough count of the bytes held by a decode template (or any nest of tuples and lists in one)
+    """
+    size = sys.getsizeof(template)
+    if isinstance(template, (tuple, list)):
+        for item in template:
+            size += template_size(item)
+    return size
+
+class DecodeCache:
+    """
+    A least recently used cache of decode templates (see DecoderLinkedList.read_structures), keyed by the packed bits of the genome.
+    Offspring are often bit identical to their parent or a sibling, and a hit skips reading the genome entirely. Organisms are still built fresh from the template on every hit, so nothing is shared between them.
+    The cache is bounded by both the number of entries and an estimate of the bytes held (genome bits plus template).
+    """
+    def __init__(self, max_entries=4096, max_bytes=64 * 1024 * 1024):
+        self._entries = OrderedDict()
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, genome):
+        """
+        Returns the cached template for this genome, or None
+        """
+        key = genome.get_key()
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return entry[0]
+
+    def put(self, genome, template):
+        key = genome.get_key()
+        size = len(key[1]) + template_size(template)
+        if size > self._max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (template, size)
+        self._bytes += size
+        # Evict the least recently used entries until both bounds are met again
+        while len(self._entries) > self._max_entries or self._bytes > self._max_bytes:
+            self._bytes -= self._entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def get_hits(self):
+        return self._hits
+
+    def get_misses(self):
+        return self._misses
+
+    def get_entry_count(self):
+        return len(self._entries)
+
+    def get_bytes(self):
+        return self._bytes
+
 class DecoderLinkedList:
     """
     A second decoder for when the genome is stored as linked list
+    Decoding happens in two passes. read_structures reads the genome into a template, a tuple of plain records with each structure's position and the values read for it, then build_organism constructs the organism and its genome nodes from the template.
     """
-    def __init__(self):
+    def __init__(self, cache=None):
         """
-        Initialize to begin reading a dna strand
+        Initialize to begin reading a dna strand. Pass a DecodeCache to reuse templates of genomes that were already read
         """
         self._genome = None
-        self._current_pos = 1
+        self._bin_genome = 0
+        self._length = 0
+        self._current_pos = 0
         self._current_organism = Body()
         self._current_organ = None
         self._current_gene = None
-        self._current_read = b''
+        self._params_start = 0 # Where the parameters of the structure being built begin
+        self._noncoding_start = 0 # Where the non coding frames after the last structure began
         self._current_node = Node()
+        self._organ_frames = None
+        self._opcode_frames = None
+        self._cache = cache
+        self._template = None
         # Create a map for how many bits to read to assemble a function
         self._bits_for_funcs = dict(zip(func_names, bits_needed))
 
     def set_genome(self, genome):
         """
-        Sets the active genome. Genome passed should be a byte string of the genome, ideally obtained from the parent.genome_head object
+        Sets the active genome. Genome passed should be a PackedGenome (or the byte string form) of the genome, ideally obtained from the parent.genome_head object
         """
-        self._genome = b'1' + genome # prepend a 1 to prevent leading zero discrepensies
+        self._genome = pack_genome(genome)
+        self._length = len(self._genome)
+        self._bin_genome = self._genome.to_int() # Shifting one int is cheaper than unpacking bytes for every read inside a structure
+        self._organ_frames = None
+        self._opcode_frames = None
 
+    def set_cache(self, cache):
+        self._cache = cache
+
+    def get_cache(self):
+        return self._cache
         
     def finish_organism(self):
         """
         On reading the whole strand, the organism will be finished, and the decoder will be reset
         """
         if self._current_organ is not None:
+            # The last node's non coding section runs to the end of the genome, past where reading stopped, so the nodes hold all of it
+            self._current_node.set_noncoding_bits(*self.read_segment(self._noncoding_start, self._length))
             if self._current_gene is not None:
-                self._current_node.set_noncoding(self._current_read)
                 self._current_gene.set_dna_head(self._current_node)
             else:
                 self._current_organ.set_dna_head(self._current_node)
             self._current_organism.add_organ(self._current_organ)
         creature = self._current_organism
+        creature.set_genome(self._genome)
+        creature.build_reactions()
         self._current_organism = Body()
         self._genome = None
-        self._current_pos = 1
+        self._bin_genome = 0
+        self._current_pos = 0
         self._current_organ = None
         self._current_gene = None
+        self._params_start = 0
+        self._noncoding_start = 0
         self._current_node = Node()
         return creature
     
     def read_at_pos(self, pos=None, length = NORMAL_READ_LENGTH):
         """
-        Reads a section of Binary DNA, at a starting position and with a length
+        Reads a section of Binary DNA, at a starting position and with a length. Returns the section as an int.
         """
         if pos == None:
             pos = self._current_pos
         if length == 0:
-            return b''
-        if pos >= len(self._genome):
-            self._current_pos = len(self._genome)
-            return b''
-        if pos + length >= len(self._genome):
-            self._current_pos = len(self._genome)
-            return b''
+            return 0
+        if pos >= self._length:
+            self._current_pos = self._length
+            return 0
+        if pos + length >= self._length:
+            self._current_pos = self._length
+            return 0
             
-        val = self._genome[pos:(pos+length)]
+        val = (self._bin_genome >> (self._length - pos - length)) & ((1 << length) - 1)
         if pos == self._current_pos:
             self._current_pos += length
         return val
 
     def read_genome(self):
         """
-        Continually reads the genome, constructing an organism as it goes.
+        Reads the genome and constructs an organism from it. If a cache is set, a genome that was read before is built straight from its cached template.
         """
-        while self._current_pos < (len(self._genome)-1) - 100:
-            read_val = self.read_at_pos()  # Returns a byte string
-            # If the gene start code was encountered begin constructing a gene, unless no organ exists to house it
-            if GENE_LOWER_LIMIT <= int(read_val,2) <= GENE_UPPER_LIMIT and self._current_organ is not None:
-                self.start_new_node('gene') # Finish the previously read node, begin a new one
-                self._current_node.set_start(read_val) # Assign the start value
-                self.read_gene_data() # Start reading it
+        return self.build_organism(self.read_template())
 
-            # If the organ start code was encountered, begin constructing an organ
-            elif ORGAN_LOWER_LIMIT <= int(read_val,2) <= ORGAN_UPPER_LIMIT:
-                self.start_new_node('organ')
-                self._current_node.set_start(read_val)
-                self.read_organ_data()
-                self._current_gene = None # resets the active gene so that we can use this as aflag as well
+    def read_summary(self, row=None):
+        """
+        Reads the genome into a SUMMARY_DTYPE row of organ and gene counts, without constructing the organism. Uses a cached template when there is one, otherwise only reads as much of each structure as it takes to find its type and length
+        """
+        template = None
+        if self._cache is not None:
+            template = self._cache.get(self._genome)
+        if template is None:
+            template = self.read_structures(skip_values=True)
+        summary = summarize_template(template, row)
+        self.finish_organism()
+        return summary
+
+    def read_template(self):
+        """
+        Returns the template for the active genome, from the cache if one is set and has it
+        """
+        template = None
+        if self._cache is not None:
+            template = self._cache.get(self._genome)
+        if template is None:
+            template = self.read_structures()
+            if self._cache is not None:
+                self._cache.put(self._genome, template)
+        self._template = template
+        return template
+
+    def read_structures(self, skip_values=False):
+        """
+        Continually reads the genome, recording every structure as it goes without constructing anything.
+        Returns a template of (records, stop) where each record is (kind, start, params start, end, values), kind is 'organ' or 'gene', and stop is where reading ended. Templates are tuples all the way down, so they can be kept and built any number of times
+        With skip_values, gene values only hold the type (see skip_gene_data) and organ values are empty. That is enough for summarize_template but can't be built into an organism
+        """
+        # Find every opcode up front, so that non coding frames can be skipped instead of read one at a time
+        self._organ_frames, self._opcode_frames = scan_opcodes(self._genome)
+        records = []
+        limit = (self._length - 1) - 100
+        while self._current_pos < limit:
+            # Genes only count once the first structure, always an organ, has been read
+            start = self.next_opcode(self._current_pos, len(records) > 0)
+            if start is None or start >= limit:
+                # Nothing left but non coding frames, move to where the frame would have stopped reading
+                self._current_pos += -(-(limit - self._current_pos) // NORMAL_READ_LENGTH) * NORMAL_READ_LENGTH
+                break
+            record = self.read_structure(start, len(records) > 0, skip_values)
+            if record is not None:
+                records.append(record)
+        template = (tuple(records), self._current_pos)
+        self._current_pos = 0
+        return template
+
+    def read_structure(self, start, has_organ, skip_values=False):
+        """
+        Reads the frame at start and, if it is an opcode, the structure it begins. Returns the structure's record, or None for a non coding frame
+        """
+        self._current_pos = start
+        read_val = self.read_at_pos()
+        params_start = self._current_pos
+        # If the gene start code was encountered begin reading a gene, unless no organ exists to house it
+        if GENE_LOWER_LIMIT <= read_val <= GENE_UPPER_LIMIT and has_organ:
+            values = self.skip_gene_data() if skip_values else self.read_gene_data()
+            return ('gene', start, params_start, self._current_pos, values)
+
+        # If the organ start code was encountered, begin reading an organ
+        elif ORGAN_LOWER_LIMIT <= read_val <= ORGAN_UPPER_LIMIT:
+            if skip_values:
+                self._current_pos += 10
+                values = ()
+            else:
+                values = self.read_organ_data()
+            return ('organ', start, params_start, self._current_pos, values)
+        return None
+
+    def reread_structures(self, parent_template, mutated):
+        """
+        Reads the active genome given the template of a parent genome of the same length and the positions of the bits that differ between them (see PackedGenome.diff_positions), re-reading only what the differences could have changed.
+        Every record boundary in the parent template is a checkpoint: reading there depends only on the position and whether an organ exists yet. Reading resumes after the last structure that ended before the first difference, and stops as soon as the reading frame lands, past the last difference, on a position the parent also read with the same state. From there the rest of the parent template is reused as is.
+        """
+        records, stop = parent_template
+        if not mutated:
+            return parent_template
+        first = min(mutated)
+        last = max(mutated)
+        starts = [record[1] for record in records]
+        ends = [record[3] for record in records]
+
+        # Keep every structure that was finished before the first difference
+        kept = bisect_right(ends, first)
+        new_records = list(records[:kept])
+        self._current_pos = ends[kept - 1] if kept else 0
+        limit = (self._length - 1) - 100
+        while self._current_pos < limit:
+            pos = self._current_pos
+            if pos > last:
+                # Find the run of non coding frames the parent read around pos, and check that the parent's frame landed on pos too
+                gap = bisect_right(ends, pos)
+                gap_start = ends[gap - 1] if gap else 0
+                gap_end = starts[gap] if gap < len(starts) else stop
+                if gap_start <= pos <= gap_end and (pos - gap_start) % NORMAL_READ_LENGTH == 0 and (gap > 0) == (len(new_records) > 0):
+                    new_records.extend(records[gap:])
+                    self._current_pos = 0
+                    return (tuple(new_records), stop)
+            record = self.read_structure(pos, len(new_records) > 0)
+            if record is not None:
+                new_records.append(record)
+        template = (tuple(new_records), self._current_pos)
+        self._current_pos = 0
+        return template
+
+    def read_genome_from_parent(self, parent_genome, parent_template, mutated=None):
+        """
+        Decodes the active genome as a mutated copy of parent_genome, whose template came from an earlier decode (get_template). mutated is the list of flipped positions, found by comparing the genomes if not given.
+        Genomes of different lengths (structural mutations) are read in full.
+        """
+        if len(parent_genome) != self._length:
+            return self.read_genome()
+        if mutated is None:
+            mutated = pack_genome(parent_genome).diff_positions(self._genome)
+        template = None
+        if self._cache is not None:
+            template = self._cache.get(self._genome)
+        if template is None:
+            template = self.reread_structures(parent_template, mutated)
+            if self._cache is not None:
+                self._cache.put(self._genome, template)
+        self._template = template
+        return self.build_organism(template)
+
+    def get_template(self):
+        """
+        Returns the template of the genome read most recently
+        """
+        return self._template
+
+    def build_organism(self, template):
+        """
+        Constructs an organism from a template made by read_structures, splitting the active genome into nodes along the recorded structures
+        """
+        records, stop = template
+        for kind, start, params_start, end, values in records:
+            self.start_new_node(kind, start, params_start) # Finish the previous node, begin a new one
+            if kind == 'gene':
+                self.build_gene(values)
             else:
-                self._current_read += read_val
+                self.build_organ(values)
+                self._current_gene = None # resets the active gene so that we can use this as aflag as well
+            self.end_structure(end)
         # Finalize the organism and return it when complete.
-        final = self.finish_organism()
-        return final
+        self._current_pos = stop
+        return self.finish_organism()
+
+    def next_opcode(self, pos, has_organ):
+        """
+        Returns the first position at or after pos, in the same reading frame, where a structure would start. Gene opcodes only count once an organ exists to house them. Non coding frames skipped over are picked up as a span when the next node starts
+        """
+        if has_organ:
+            frames = self._opcode_frames[pos % NORMAL_READ_LENGTH]
+        else:
+            frames = self._organ_frames[pos % NORMAL_READ_LENGTH]
+        i = bisect_left(frames, pos)
+        if i < len(frames):
+            return frames[i]
+        return None
 
     def read_organ_data(self):
         """
-        Reads organ data (right now, only has 3 parameters: health, activation, and reaction), constructs the organ.
+        Reads organ data (right now, only has 3 parameters: health, activation, and reaction). Returns (reaction rate, activation rate) as read
+        """
+        reaction_rate = self.read_at_pos(length=5)
+        act_rate = self.read_at_pos(length=5)
+        return (reaction_rate, act_rate)
+
+    def build_organ(self, values):
+        """
+        Constructs an organ from the values returned by read_organ_data
         """
         # Assign the current organism the previously active organ
         if self._current_organ is not None:
             self._current_organism.add_organ(self._current_organ)
             
-        # Create a new organ and get the parameters.
+        # Create a new organ and set the parameters.
         self._current_organ = InternalOrgan('internal', self._current_organism)
         self._current_organ.set_def_health()
-        val = self.read_at_pos(length=5)
-        read = val
-        self._current_organ.set_reaction_rate(int(val,2)/32)
-        val = self.read_at_pos(length=5)
-        read += val
-        self._current_organ.set_act_rate(int(val,2)/32)
-        self._current_node.set_params(read)
-        return
+        self._current_organ.set_reaction_rate(values[0]/32)
+        self._current_organ.set_act_rate(values[1]/32)
 
     def read_gene_data(self):
         """
-        Constructs a gene (currently only 2 types (emitter, and receptor))) and gets parameters for it.
+        Reads the parameters of a gene (receptor, emitter or reaction).
+        Returns (type, rate, function, function params, organ param, chemical) for receptors and emitters (rate is None for receptors), and (type, reaction values) for reactions
         """
         # Find out what type of gene it is
-        type = self.read_at_pos(length = GENE_READ_LENGTH)
-        read = type
-        type = int(type,2) % GENE_TYPES
+        type = self.read_at_pos(length = GENE_READ_LENGTH) % GENE_TYPES
         if type == 2:
             # It's gonna be easier to separate all the logic into separate functions instead
-            self._current_gene = Reaction(self._current_organ, 'reaction')
-            self.read_reaction_data()
-            return
-        elif type == 1:
-            self._current_gene = Emitter(self._current_organ, 'emitter')
+            return (type, self.read_reaction_data())
+        rate = None
+        if type == 1:
             rate = self.read_at_pos(length=5)
-            read += rate
-            self._current_gene.set_output_rate(int(rate,2))
-        elif type == 0:
-            self._current_gene = Receptor(self._current_organ, 'receptor')
         
         # Now parse the function this gene uses. Each function needs different parameters
         func = self.read_at_pos(length = 3)
-        read += func
-        func = int(func,2)
-        func_name = func_names[func]
-        func_read_lengths = bits_needed[func]
-        params = []
         # If the function needs parameters, then read each one as needed
-        for param in func_read_lengths:
-            val = self.read_at_pos(length = param)
-            read += val
-            params.append(int(val,2))
-        if params:
-            function = functions[func](*params)
-        else:
-            function = functions[func]()
-        self._current_gene.set_activation(func_name, function)
+        params = tuple(self.read_at_pos(length = param) for param in bits_needed[func])
 
         # Now handle the other parameters of the gene
-        val = self.read_at_pos(length = 4)
-        read += val
-        val = int(val,2) % self._current_organ.get_param_numbers()
-        p=  self._current_organ._parameters[val]
-        self._current_gene.set_parameter(p[0], p[1])
-        val = self.read_at_pos(length = 4)
-        read += val
-        val = int(val,2)
-        self._current_gene.set_chemical(val)
+        param = self.read_at_pos(length = 4)
+        chemical = self.read_at_pos(length = 4)
+        return (type, rate, func, params, param, chemical)
+
+    def skip_gene_data(self):
+        """
+        Moves past a gene exactly as read_gene_data would, but only reads what decides its length. Returns (type,), or (type, None) for a reaction cut off by the end of the genome.
+        Structures never reach into the last 100 bits, so skipping ahead can't run off the end the way a read could
+        """
+        type = self.read_at_pos(length = GENE_READ_LENGTH) % GENE_TYPES
+        if type == 2:
+            if self._current_pos > self._length - 50:
+                return (type, None)
+            left = self.read_at_pos(length = 4)
+            right = self.read_at_pos(length = 4)
+            self._current_pos += 10 * ((left % 2) + 1 + (right % 3))
+            return (type,)
+        if type == 1:
+            self._current_pos += 5
+        func = self.read_at_pos(length = 3)
+        self._current_pos += sum(bits_needed[func]) + 8
+        return (type,)
+
+    def build_gene(self, values):
+        """
+        Constructs a gene from the values returned by read_gene_data and adds it to the current organ
+        """
+        type = values[0]
+        if type == 2:
+            self._current_gene = Reaction(self._current_organ, 'reaction')
+            self.build_reaction(values[1])
+            return
+        elif type == 1:
+            self._current_gene = Emitter(self._current_organ, 'emitter')
+            self._current_gene.set_output_rate(values[1])
+        elif type == 0:
+            self._current_gene = Receptor(self._current_organ, 'receptor')
+
+        type, rate, func, params, param, chemical = values
+        self._current_gene.set_activation(func_names[func], get_activation(func, params))
+        self._current_gene.set_parameter(self._current_organ.get_param_at_index(param % self._current_organ.get_param_numbers()))
+        self._current_gene.set_chemical(chemical)
         self._current_organ.add_gene(self._current_gene)
-        self._current_node.set_params(read)
 
     def read_reaction_data(self):
-        if self._current_pos > len(self._genome)-50:
-            return
+        """
+        Returns (left, right, ((coefficient, chemical), ...)), or None if the reaction is too close to the end of the genome to be read
+        """
+        if self._current_pos > self._length - 50:
+            return None
         left = self.read_at_pos(length = 4)
         right = self.read_at_pos(length = 4)
-        read = left+ right
-        self._current_gene.set_num_of_chems_left(int(left,2))
-        self._current_gene.set_num_of_chems_right(int(right,2))
         chems = []
-        for i in range((int(left,2) % 2) + 1 + (int(right,2) % 3)):
+        for i in range((left % 2) + 1 + (right % 3)):
             val = self.read_at_pos(length = 6)
-            read += val
             chem = self.read_at_pos(length = 4)
-            read += chem
-            chems.append((int(val,2),int(chem,2)))
-        self._current_gene.set_chems_and_coefficients(chems)
+            chems.append((val,chem))
+        return (left, right, tuple(chems))
+
+    def build_reaction(self, values):
+        # A reaction cut off by the end of the genome is never added to the organ
+        if values is None:
+            return
+        left, right, chems = values
+        self._current_gene.set_num_of_chems_left(left)
+        self._current_gene.set_num_of_chems_right(right)
+        self._current_gene.set_chems_and_coefficients(list(chems))
         self._current_organ.add_gene(self._current_gene)
-        self._current_node.set_params(read)
         
-    def start_new_node(self, type):
-        self._current_node.set_noncoding(self._current_read)
+    def read_segment(self, start, end):
+        """
+        Returns the genome from start to end as (value, length in bits), ready for one of the Node.set_*_bits methods
+        """
+        length = max(end - start, 0)
+        return (self._genome.read(start, length), length)
+
+    def start_new_node(self, type, pos, params_start):
+        """
+        Finishes the previous node, giving it every non coding frame since its structure ended, and begins a new node whose start is the opcode from pos to params_start
+        """
+        self._current_node.set_noncoding_bits(*self.read_segment(self._noncoding_start, pos))
         self._current_node.next = Node()
-        self._current_read = b''
         
         if self._current_organ is None:
             # If organ opcode was encountered but no organ started yet, this is the first node
@@ -363,3 +730,46 @@ class DecoderLinkedList:
                 self._current_gene.set_dna_head(self._current_node)
         
         self._current_node = self._current_node.next
+        self._current_node.set_start_bits(*self.read_segment(pos, params_start))
+        self._params_start = params_start
+
+    def end_structure(self, end):
+        """
+        Everything from the opcode up to end belongs to the parameters of the current node
+        """
+        self._current_node.set_params_bits(*self.read_segment(self._params_start, end))
+        self._noncoding_start = end
+
+
+def decode_chunk(genomes, phenotype=analyze_organism, decoder_type=DecoderLinkedList):
+    """
+    Decodes a list of genomes in order with a single decoder. This is what each worker runs for decode_many
+    """
+    decoder = decoder_type()
+    results = []
+    for genome in genomes:
+        decoder.set_genome(genome)
+        creature = decoder.read_genome()
+        results.append(creature if phenotype is None else phenotype(creature))
+    return results
+
+def decode_many(genomes, workers=1, chunk_size=64, phenotype=analyze_organism, decoder_type=DecoderLinkedList):
+    """
+    Decodes a list or iterator of genomes, returning one result per genome in the same order.
+    Each creature is reduced to phenotype(creature) (analyze_organism by default) before it is returned, or with phenotype=None the Bodies themselves are returned.
+    With more than one worker, genomes are split into chunks of chunk_size and handed out to a process pool. workers=None uses every core.
+    Note the decoding constants (GENE_LOWER_LIMIT etc.) are whatever they were when the pool started, which on platforms that spawn rather than fork means their values at import.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        return decode_chunk(genomes, phenotype, decoder_type)
+
+    genomes = iter(genomes)
+    chunks = iter(lambda: list(islice(genomes, chunk_size)), [])
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map hands chunks back in the order they were submitted, so results line up with genomes
+        for chunk in pool.map(partial(decode_chunk, phenotype=phenotype, decoder_type=decoder_type), chunks):
+            results.extend(chunk)
+    return results
@@ -0,0 +1,198 @@
+"""
+Exact organ and gene counts for random genomes, worked out from the decoding schema instead of by sampling.
+DecoderLinkedList only ever moves forward through the genome, so every frame it reads is made of fresh, uniformly random bits. That makes the reader a Markov chain whose state is just its position and whether an organ exists yet, and the distributions of everything it builds can be computed by pushing probability forward through the positions.
+"""
+import numpy as np
+import Constructor
+from utilities import bits_needed
+
+# Decoder layout, in bits. These mirror the reads in DecoderLinkedList.read_organ_data, read_gene_data and read_reaction_data
+ORGAN_PARAM_BITS = 10
+FUNC_BITS = 3
+EMITTER_RATE_BITS = 5
+GENE_TAIL_BITS = 8 # organ parameter and chemical
+REACTION_HEAD_BITS = 8 # left and right counts
+REACTION_CHEM_BITS = 10 # coefficient and chemical for each one
+READ_MARGIN = 100 # The decoder stops reading this far from the end
+REACTION_MARGIN = 50 # Reactions whose type ends closer than this to the end are cut off and never added
+
+class DecodeModel:
+    """
+    Models DecoderLinkedList reading a uniformly random genome of a given length. Opcode ranges default to the current Constructor limits, so changing Constructor.GENE_UPPER_LIMIT etc. before building a model works the same as it does for the decoder.
+    Each distribution is computed the first time it is asked for and kept.
+    """
+    def __init__(self, length, gene_range=None, organ_range=None):
+        if gene_range is None:
+            gene_range = (Constructor.GENE_LOWER_LIMIT, Constructor.GENE_UPPER_LIMIT)
+        if organ_range is None:
+            organ_range = (Constructor.ORGAN_LOWER_LIMIT, Constructor.ORGAN_UPPER_LIMIT)
+        self._length = length
+        self._limit = max((length - 1) - READ_MARGIN, 0)
+        frame_values = 2 ** Constructor.NORMAL_READ_LENGTH
+        genes = set(range(max(gene_range[0], 0), min(gene_range[1], frame_values - 1) + 1))
+        organs = set(range(max(organ_range[0], 0), min(organ_range[1], frame_values - 1) + 1))
+        # Gene opcodes are checked first, but only once an organ exists
+        self._first_organ_odds = len(organs) / frame_values
+        self._gene_odds = len(genes) / frame_values
+        self._organ_odds = len(organs - genes) / frame_values
+        self._type_odds = {'receptor': 0.0, 'emitter': 0.0, 'reaction': 0.0}
+        self._plain_steps = {}
+        self._reaction_steps = {}
+        self._type_steps = {'receptor': {}, 'emitter': {}, 'reaction': {}}
+        self.find_gene_steps()
+        # Every way a gene can move the reading frame as (type, distance, odds), with and without reactions (which near the end are cut off instead)
+        self._moves = [(kind, step, odds) for kind, steps in self._type_steps.items() for step, odds in steps.items()]
+        self._cut_moves = [move for move in self._moves if move[0] != 'reaction']
+        # Nothing can be built in fewer bits than the shortest gene, so this holds every possible count
+        shortest = min(min(self._plain_steps), min(self._reaction_steps))
+        self._size = self._limit // shortest + 2
+        self._results = {}
+
+    def find_gene_steps(self):
+        """
+        Works out how far a gene moves the reading frame (counting its opcode) and how likely each distance is, separately for reactions since those can be cut off
+        """
+        frame = Constructor.NORMAL_READ_LENGTH
+        type_values = 2 ** Constructor.GENE_READ_LENGTH
+        func_values = 2 ** FUNC_BITS
+        for type in range(type_values):
+            kind = ('receptor', 'emitter', 'reaction')[type % Constructor.GENE_TYPES]
+            self._type_odds[kind] += 1 / type_values
+            if kind == 'reaction':
+                for left in range(16):
+                    for right in range(16):
+                        step = frame + Constructor.GENE_READ_LENGTH + REACTION_HEAD_BITS + REACTION_CHEM_BITS * ((left % 2) + 1 + (right % 3))
+                        self._reaction_steps[step] = self._reaction_steps.get(step, 0) + 1 / (type_values * 256)
+                        self._type_steps[kind][step] = self._type_steps[kind].get(step, 0) + 1 / (type_values * 256)
+                continue
+            base = frame + Constructor.GENE_READ_LENGTH + FUNC_BITS + GENE_TAIL_BITS
+            if kind == 'emitter':
+                base += EMITTER_RATE_BITS
+            for func in range(func_values):
+                step = base + sum(bits_needed[func])
+                self._plain_steps[step] = self._plain_steps.get(step, 0) + 1 / (type_values * func_values)
+                self._type_steps[kind][step] = self._type_steps[kind].get(step, 0) + 1 / (type_values * func_values)
+
+    def forward(self, track):
+        """
+        Pushes probability through the reading frame positions, keeping a distribution over one counter alongside each position. track is 'organs', 'genes', 'per organ' (genes in the organ being read), or a gene type ('receptor', 'emitter' or 'reaction') to count only genes of that type.
+        Returns (distribution of the counter when reading stops, expected number of organs finished with each gene count, expected number of genes of each type). The second is only filled in for 'per organ'
+        """
+        frame = Constructor.NORMAL_READ_LENGTH
+        organ_step = frame + ORGAN_PARAM_BITS
+        cutoff_step = frame + Constructor.GENE_READ_LENGTH
+        reach = self._limit + max(organ_step, max(self._plain_steps), max(self._reaction_steps)) + 1
+        before = np.zeros(reach) # Mass still waiting on the first organ, which has counted nothing yet
+        after = np.zeros((reach, self._size))
+        before[0] = 1.0
+        closed = np.zeros(self._size)
+        plain_read = 0.0
+        reactions_read = 0.0
+        noncoding_odds = 1 - self._organ_odds - self._gene_odds
+        for pos in range(self._limit):
+            mass = before[pos]
+            if mass:
+                after[pos + organ_step, 1 if track == 'organs' else 0] += mass * self._first_organ_odds
+                before[pos + frame] += mass * (1 - self._first_organ_odds)
+            counts = after[pos]
+            if not counts.any():
+                continue
+            after[pos + frame] += counts * noncoding_odds
+
+            # An organ opcode starts a new organ
+            organs = counts * self._organ_odds
+            if track == 'organs':
+                after[pos + organ_step, 1:] += organs[:-1]
+            elif track != 'per organ':
+                # Gene counts, of every type or one, carry on across organs
+                after[pos + organ_step] += organs
+            else:
+                closed += organs
+                after[pos + organ_step, 0] += organs.sum()
+
+            # A gene opcode adds a gene to the current organ, unless it is a reaction cut off by the end of the genome
+            genes = counts * self._gene_odds
+            gene_mass = genes.sum()
+            moves = self._moves
+            plain_read += gene_mass * (self._type_odds['receptor'] + self._type_odds['emitter'])
+            if pos + cutoff_step > self._length - REACTION_MARGIN:
+                after[pos + cutoff_step] += genes * self._type_odds['reaction']
+                moves = self._cut_moves
+            else:
+                reactions_read += gene_mass * self._type_odds['reaction']
+            for kind, step, odds in moves:
+                if track == 'organs' or (track in self._type_steps and track != kind):
+                    after[pos + step] += genes * odds
+                else:
+                    after[pos + step, 1:] += genes[:-1] * odds
+
+        end = after[self._limit:].sum(axis=0)
+        end[0] += before[self._limit:].sum()
+        if track == 'per organ':
+            # The last organ is finished when reading stops
+            closed += end
+            closed[0] -= before[self._limit:].sum()
+        plain_odds = self._type_odds['receptor'] + self._type_odds['emitter']
+        types = {'receptor': plain_read * self._type_odds['receptor'] / plain_odds,
+                 'emitter': plain_read * self._type_odds['emitter'] / plain_odds,
+                 'reaction': reactions_read}
+        return end, closed, types
+
+    def get_result(self, track):
+        if track not in self._results:
+            self._results[track] = self.forward(track)
+        return self._results[track]
+
+    def organ_distribution(self):
+        """
+        Returns an array where index k is the probability of decoding exactly k organs
+        """
+        return self.get_result('organs')[0]
+
+    def gene_distribution(self):
+        """
+        Returns an array where index k is the probability of decoding exactly k genes
+        """
+        return self.get_result('genes')[0]
+
+    def organs_by_gene_count(self):
+        """
+        Returns an array where index k is the expected number of organs with exactly k genes in one organism (the analytic version of analyze_organs)
+        """
+        return self.get_result('per organ')[1]
+
+    def genes_per_organ_distribution(self):
+        """
+        Returns an array where index k is the probability that an organ picked from all decoded organs has exactly k genes
+        """
+        organs = self.organs_by_gene_count()
+        total = organs.sum()
+        if total == 0:
+            return organs
+        return organs / total
+
+    def gene_type_distribution(self, kind):
+        """
+        Returns an array where index k is the probability of decoding exactly k genes of one type ('receptor', 'emitter' or 'reaction')
+        """
+        if kind not in self._type_steps:
+            raise ValueError(f"unknown gene type {kind}")
+        return self.get_result(kind)[0]
+
+    def gene_type_counts(self):
+        """
+        Returns the expected number of receptor, emitter and reaction genes in one organism
+        """
+        return dict(self.get_result('genes')[2])
+
+    def expected_counts(self):
+        """
+        Returns the expected organ and gene counts, named like the keys of analyze_organism
+        """
+        counts = np.arange(self._size)
+        types = self.gene_type_counts()
+        return {"Organ Count": float(counts @ self.organ_distribution()),
+                "Gene Count": float(counts @ self.gene_distribution()),
+                "Receptor Count": float(types['receptor']),
+                "Emitter Count": float(types['emitter']),
+                "Reaction Count": float(types['reaction'])}
@@ -1,47 +1,272 @@
 """
 Creates a class for the genome in which the entire genome is saved into chunks and is a singly linked list
 """
+import numpy as np
 
 class Node:
     """
-    Each node points to the next node in the genome. Contains the bits as the start (opcode), the parameters of the structure, and then all non-coding sections following it. Genome segments must be passed as bytes, and then are prepended with 1 (to preserve leading 0s) and converted to binary(save space while stored in mem). Using the segments means needing to drop the leading 1
+    Each node points to the next node in the genome. Contains the bits as the start (opcode), the parameters of the structure, and then all non-coding sections following it. Each segment is kept as an int plus its length in bits, so leading 0s survive without a sentinel and reading one back doesn't re-parse anything.
+    Segments can be set from the byte string form (b'0101'), a PackedGenome, or directly as bits with the set_*_bits methods. A segment that was never set is empty.
     """
+    __slots__ = ('_start', '_start_length', '_params', '_params_length', '_noncoding', '_noncoding_length', 'next')
+
     def __init__(self):
-        self._start = None
-        self._params = None 
-        self._noncoding = None
+        self._start = 0
+        self._start_length = 0
+        self._params = 0
+        self._params_length = 0
+        self._noncoding = 0
+        self._noncoding_length = 0
         self.next = None
 
     def get_structure_genome(self):
         """
-        Return the entire genome for this structure
-        Test to confirm this works correctly and doesnt add or lose values.
+        Return the entire genome for this structure as a PackedGenome
         """
-        return self.get_start() + self.get_params() + self.get_noncoding()
+        length = self._start_length + self._params_length + self._noncoding_length
+        value = (((self._start << self._params_length) | self._params) << self._noncoding_length) | self._noncoding
+        return PackedGenome(length, value)
 
     def set_start(self, start):
-        self._start = bin(int(b'1'+start,2))
+        self._start, self._start_length = segment_bits(start)
 
     def set_params(self, params):
-        self._params = bin(int(b'1'+params,2))
+        self._params, self._params_length = segment_bits(params)
 
     def set_noncoding(self, noncoding):
-        self._noncoding = bin(int(b'1'+noncoding,2))
+        self._noncoding, self._noncoding_length = segment_bits(noncoding)
+
+    def set_start_bits(self, value, length):
+        self._start = value
+        self._start_length = length
+
+    def set_params_bits(self, value, length):
+        self._params = value
+        self._params_length = length
+
+    def set_noncoding_bits(self, value, length):
+        self._noncoding = value
+        self._noncoding_length = length
 
     def get_start(self):
-        return bytes(str(bin(int(self._start,2)))[3:],'utf-8')
-        
+        return segment_bytes(self._start, self._start_length)
+
     def get_params(self):
-        return bytes(str(bin(int(self._start,2)))[3:],'utf-8')
+        return segment_bytes(self._params, self._params_length)
 
     def get_noncoding(self):
-        return bytes(str(bin(int(self._start,2)))[3:],'utf-8')
+        return segment_bytes(self._noncoding, self._noncoding_length)
+
+    def get_start_bits(self):
+        """
+        Returns the start as (value, length in bits)
+        """
+        return (self._start, self._start_length)
+
+    def get_params_bits(self):
+        return (self._params, self._params_length)
+
+    def get_noncoding_bits(self):
+        return (self._noncoding, self._noncoding_length)
+
+    def get_length(self):
+        """
+        Returns how many bits this node holds
+        """
+        return self._start_length + self._params_length + self._noncoding_length
 
     def get_next(self):
         return self.next
 
+    def copy(self):
+        """
+        Returns a new node with the same segments, not linked to anything
+        """
+        new = Node()
+        new._start = self._start
+        new._start_length = self._start_length
+        new._params = self._params
+        new._params_length = self._params_length
+        new._noncoding = self._noncoding
+        new._noncoding_length = self._noncoding_length
+        return new
+
     def get_entire_genome(self):
-        val = self.get_structure_genome()
-        if self.next is not None:
-            val += next.get_structure_genome()
-        return val
+        """
+        Returns the genome from this node to the end of the list as a PackedGenome
+        """
+        value = 0
+        length = 0
+        node = self
+        while node is not None:
+            value = (((((value << node._start_length) | node._start) << node._params_length) | node._params) << node._noncoding_length) | node._noncoding
+            length += node._start_length + node._params_length + node._noncoding_length
+            node = node.next
+        return PackedGenome(length, value)
+
+def segment_bits(segment):
+    """
+    Converts a segment given in the byte string form or as a PackedGenome (or None, for an empty segment) into (value, length in bits)
+    """
+    if not segment:
+        return (0, 0)
+    if isinstance(segment, PackedGenome):
+        return (segment.to_int(), len(segment))
+    return (int(segment, 2), len(segment))
+
+def segment_bytes(value, length):
+    """
+    Converts a segment's (value, length) back into the byte string form
+    """
+    if length == 0:
+        return b''
+    # Set a sentinel bit above the segment so leading 0s survive bin()
+    return bin(value | (1 << length))[3:].encode()
+
+
+class PackedGenome:
+    """
+    A genome stored with 8 bits packed into every byte, instead of one ASCII b'0'/b'1' per bit. Bit 0 is the leftmost bit of the strand, the same orientation as the byte string form, and any pad bits at the end of the last byte are kept at 0.
+    Converting with from_bytes/to_bytes is lossless, so anything still expecting the byte string form can get it back.
+    """
+    __slots__ = ('_bits', '_length')
+
+    def __init__(self, length=0, value=0):
+        """
+        Builds a genome of length bits out of an int, where the highest bit of value is the first bit of the genome
+        """
+        self._length = length
+        pad = (-length) % 8
+        self._bits = bytearray((value << pad).to_bytes((length + 7) // 8, 'big'))
+
+    @classmethod
+    def from_bytes(cls, strand):
+        """
+        Converts the byte string form (b'0110...') into a packed genome
+        """
+        if not strand:
+            return cls(0)
+        return cls(len(strand), int(strand, 2))
+
+    def to_bytes(self, start=0, end=None):
+        """
+        Converts the genome, or the section from start to end, back into the byte string form
+        """
+        if end is None or end > self._length:
+            end = self._length
+        if end <= start:
+            return b''
+        # Plain ints, so NumPy positions (e.g. from a GenomeIndex) can't overflow the shifts
+        start = int(start)
+        length = int(end) - start
+        # Set a sentinel bit above the section so leading 0s survive bin()
+        return bin(self.read(start, length) | (1 << length))[3:].encode()
+
+    @classmethod
+    def from_array(cls, bits):
+        """
+        Packs a NumPy array with one 0 or 1 per bit (like to_array returns) into a genome
+        """
+        genome = cls.__new__(cls)
+        genome._length = len(bits)
+        genome._bits = bytearray(np.packbits(np.asarray(bits, dtype=np.uint8)).tobytes())
+        return genome
+
+    def to_int(self):
+        return int.from_bytes(self._bits, 'big') >> ((-self._length) % 8)
+
+    def read(self, pos, length):
+        """
+        Reads length bits starting at pos and returns them as an int, the packed equivalent of int(strand[pos:pos+length], 2)
+        """
+        if length <= 0:
+            return 0
+        first = pos >> 3
+        last = (pos + length + 7) >> 3
+        chunk = int.from_bytes(self._bits[first:last], 'big')
+        return (chunk >> ((last << 3) - pos - length)) & ((1 << length) - 1)
+
+    def to_array(self):
+        """
+        Unpacks the genome into a NumPy array with one uint8 (0 or 1) per bit
+        """
+        return np.unpackbits(np.frombuffer(self._bits, dtype=np.uint8), count=self._length)
+
+    def get_bit(self, pos):
+        return (self._bits[pos >> 3] >> (7 - (pos & 7))) & 1
+
+    def flip(self, pos):
+        """
+        Flips a single bit in place
+        """
+        self._bits[pos >> 3] ^= 0x80 >> (pos & 7)
+
+    def flip_many(self, positions):
+        """
+        Flips the bit at every position in place, in one pass over the buffer instead of one flip call each. A position given twice is flipped back
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        if len(positions) == 0:
+            return
+        bits = np.frombuffer(self._bits, dtype=np.uint8)
+        np.bitwise_xor.at(bits, positions >> 3, (0x80 >> (positions & 7)).astype(np.uint8))
+
+    def diff_positions(self, other):
+        """
+        Returns the sorted positions where this genome and another of the same length have different bits
+        """
+        diff = self.to_int() ^ other.to_int()
+        positions = []
+        while diff:
+            low = diff & -diff
+            positions.append(self._length - low.bit_length())
+            diff ^= low
+        positions.reverse()
+        return positions
+
+    def get_key(self):
+        """
+        Returns a hashable snapshot of the genome, equal for any two genomes with the same bits
+        """
+        return (self._length, bytes(self._bits))
+
+    def copy(self):
+        new = PackedGenome.__new__(PackedGenome)
+        new._length = self._length
+        new._bits = bytearray(self._bits)
+        return new
+
+    def get_buffer(self):
+        """
+        Returns the underlying packed bytes (not a copy)
+        """
+        return self._bits
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, pos):
+        if pos < 0:
+            pos += self._length
+        if not 0 <= pos < self._length:
+            raise IndexError("genome position out of range")
+        return self.get_bit(pos)
+
+    def __eq__(self, other):
+        if isinstance(other, PackedGenome):
+            return self._length == other._length and self._bits == other._bits
+        if isinstance(other, (bytes, bytearray)):
+            return self.to_bytes() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"PackedGenome({self.to_bytes()!r})"
+
+
+def pack_genome(genome, copy=False):
+    """
+    Returns the genome as a PackedGenome, converting it if it is still in the byte string form. Pass copy=True when the result is going to be mutated
+    """
+    if isinstance(genome, PackedGenome):
+        return genome.copy() if copy else genome
+    return PackedGenome.from_bytes(genome)
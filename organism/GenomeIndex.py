@@ -0,0 +1,222 @@
+"""
+A genome's structures kept as parallel arrays over one packed genome, instead of as a linked list of Nodes.
+Finding the k-th structure is a lookup rather than a walk from the head, and structural mutations (deletion, duplication, moving structures around) become one rearrange of the arrays and one gather of the bits.
+"""
+import numpy as np
+from Genome import Node, PackedGenome
+import Constructor
+
+# Structure kinds. The head is the non coding stretch before the first organ, the same as the first Node of a decoded organism
+HEAD = 0
+ORGAN = 1
+GENE = 2
+KIND_NAMES = {'head': HEAD, 'organ': ORGAN, 'gene': GENE}
+
+class GenomeIndex:
+    """
+    Structure i covers the genome from starts[i] to noncoding_ends[i]: its opcode runs up to params_starts[i], its parameters up to params_ends[i], and the non coding frames after it up to noncoding_ends[i], which is where structure i + 1 starts.
+    Structure 0 is always the head, with an empty opcode and parameters. Everything after the last structure counts as its non coding section, so the index always covers the whole genome.
+    """
+    def __init__(self, genome, kinds, starts, params_starts, params_ends, noncoding_ends):
+        self._genome = genome
+        self._kinds = np.asarray(kinds, dtype=np.int8)
+        self._starts = np.asarray(starts, dtype=np.int64)
+        self._params_starts = np.asarray(params_starts, dtype=np.int64)
+        self._params_ends = np.asarray(params_ends, dtype=np.int64)
+        self._noncoding_ends = np.asarray(noncoding_ends, dtype=np.int64)
+
+    @classmethod
+    def from_template(cls, genome, template):
+        """
+        Builds the index of a genome from the template DecoderLinkedList.read_template made of it
+        """
+        records = template[0]
+        count = len(records) + 1
+        kinds = np.zeros(count, dtype=np.int8)
+        starts = np.zeros(count, dtype=np.int64)
+        params_starts = np.zeros(count, dtype=np.int64)
+        params_ends = np.zeros(count, dtype=np.int64)
+        for i, record in enumerate(records, 1):
+            kinds[i] = KIND_NAMES[record[0]]
+            starts[i] = record[1]
+            params_starts[i] = record[2]
+            params_ends[i] = record[3]
+        noncoding_ends = np.append(starts[1:], len(genome))
+        return cls(genome, kinds, starts, params_starts, params_ends, noncoding_ends)
+
+    @classmethod
+    def from_nodes(cls, head):
+        """
+        Builds the index from a linked list of Nodes, such as the one a decoded organism keeps. Kinds are worked out from the opcodes the same way the decoder does
+        """
+        kinds = []
+        lengths = []
+        has_organ = False
+        node = head
+        while node is not None:
+            start, start_length = node.get_start_bits()
+            if start_length == 0:
+                kinds.append(HEAD)
+            elif Constructor.GENE_LOWER_LIMIT <= start <= Constructor.GENE_UPPER_LIMIT and has_organ:
+                kinds.append(GENE)
+            else:
+                kinds.append(ORGAN)
+                has_organ = True
+            lengths.append((start_length, node.get_params_bits()[1], node.get_noncoding_bits()[1]))
+            node = node.next
+        lengths = np.array(lengths, dtype=np.int64).reshape(-1, 3)
+        noncoding_ends = np.cumsum(lengths.sum(axis=1))
+        starts = noncoding_ends - lengths.sum(axis=1)
+        params_starts = starts + lengths[:, 0]
+        params_ends = params_starts + lengths[:, 1]
+        return cls(head.get_entire_genome(), kinds, starts, params_starts, params_ends, noncoding_ends)
+
+    def to_nodes(self):
+        """
+        Returns the head of a linked list of Nodes holding the same structures
+        """
+        head = None
+        previous = None
+        for i in range(len(self)):
+            node = Node()
+            node.set_start_bits(*self.get_start_bits(i))
+            node.set_params_bits(*self.get_params_bits(i))
+            node.set_noncoding_bits(*self.get_noncoding_bits(i))
+            if previous is None:
+                head = node
+            else:
+                previous.next = node
+            previous = node
+        return head
+
+    def __len__(self):
+        return len(self._kinds)
+
+    def get_genome(self):
+        return self._genome
+
+    def get_kinds(self):
+        return self._kinds
+
+    def get_starts(self):
+        return self._starts
+
+    def get_start_spans(self):
+        """
+        Returns an (n, 2) array of where each structure's opcode starts and ends
+        """
+        return np.stack((self._starts, self._params_starts), axis=1)
+
+    def get_params_spans(self):
+        """
+        Returns an (n, 2) array of where each structure's parameters start and end
+        """
+        return np.stack((self._params_starts, self._params_ends), axis=1)
+
+    def get_noncoding_spans(self):
+        """
+        Returns an (n, 2) array of where each structure's non coding section starts and ends
+        """
+        return np.stack((self._params_ends, self._noncoding_ends), axis=1)
+
+    def get_span_positions(self, spans):
+        """
+        Returns every bit position covered by an (n, 2) array of spans (like get_params_spans returns), in span order
+        """
+        spans = np.asarray(spans, dtype=np.int64).reshape(-1, 2)
+        lengths = spans[:, 1] - spans[:, 0]
+        offsets = np.cumsum(lengths) - lengths
+        return np.repeat(spans[:, 0] - offsets, lengths) + np.arange(int(lengths.sum()))
+
+    def get_lengths(self):
+        """
+        Returns how many bits each structure covers, non coding section included
+        """
+        return self._noncoding_ends - self._starts
+
+    def get_structure(self, i):
+        """
+        Returns (kind, start, params start, params end, non coding end) of the i-th structure
+        """
+        return (int(self._kinds[i]), int(self._starts[i]), int(self._params_starts[i]), int(self._params_ends[i]), int(self._noncoding_ends[i]))
+
+    def read_span(self, start, end):
+        length = int(end - start)
+        return (self._genome.read(int(start), length), length)
+
+    def get_start_bits(self, i):
+        """
+        Returns the i-th structure's opcode as (value, length in bits), like Node.get_start_bits
+        """
+        return self.read_span(self._starts[i], self._params_starts[i])
+
+    def get_params_bits(self, i):
+        return self.read_span(self._params_starts[i], self._params_ends[i])
+
+    def get_noncoding_bits(self, i):
+        return self.read_span(self._params_ends[i], self._noncoding_ends[i])
+
+    def get_indices(self, kind):
+        """
+        Returns the indices of every structure of one kind (ORGAN or GENE)
+        """
+        return np.flatnonzero(self._kinds == kind)
+
+    def select(self, mutation_rate, rng=None, kind=None):
+        """
+        Picks each structure (never the head) with probability mutation_rate, optionally only structures of one kind. Returns the sorted indices picked
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        picked = rng.random(len(self)) < mutation_rate
+        picked[0] = False
+        if kind is not None:
+            picked &= self._kinds == kind
+        return np.flatnonzero(picked)
+
+    def rearrange(self, order):
+        """
+        Returns a new index, and genome, made of this one's structures in the given order. Indices can repeat or be left out, but order has to begin with the head (0)
+        """
+        order = np.asarray(order, dtype=np.int64)
+        if len(order) == 0 or order[0] != 0:
+            raise ValueError("a rearranged genome has to begin with the head structure")
+        lengths = self.get_lengths()[order]
+        new_starts = np.cumsum(lengths) - lengths
+        old_starts = self._starts[order]
+        # Every new bit position maps back to one old one, so the new genome is a single gather
+        total = int(lengths.sum())
+        gather = np.repeat(old_starts - new_starts, lengths) + np.arange(total)
+        genome = PackedGenome.from_array(self._genome.to_array()[gather])
+        shift = new_starts - old_starts
+        return GenomeIndex(genome, self._kinds[order], new_starts, self._params_starts[order] + shift, self._params_ends[order] + shift, self._noncoding_ends[order] + shift)
+
+    def delete(self, indices):
+        """
+        Returns a new index without the structures at indices
+        """
+        keep = np.ones(len(self), dtype=bool)
+        keep[np.asarray(indices, dtype=np.int64)] = False
+        keep[0] = True
+        return self.rearrange(np.flatnonzero(keep))
+
+    def duplicate(self, indices):
+        """
+        Returns a new index where each structure at indices is followed by a copy of itself
+        """
+        copies = np.ones(len(self), dtype=np.int64)
+        np.add.at(copies, np.asarray(indices, dtype=np.int64), 1)
+        return self.rearrange(np.repeat(np.arange(len(self)), copies))
+
+    def transpose(self, indices, targets):
+        """
+        Returns a new index where a copy of each structure in indices is placed after the structure at the matching position of targets (the originals stay where they are)
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        order = np.arange(len(self))
+        # Sorting on (place, copy flag) puts each copy straight after its target, in the order given
+        places = np.concatenate((order, targets))
+        flags = np.concatenate((np.zeros(len(self), dtype=np.int64), np.arange(1, len(indices) + 1)))
+        sources = np.concatenate((order, indices))
+        return self.rearrange(sources[np.lexsort((flags, places))])
@@ -0,0 +1,200 @@
+"""
+Compiles one organism into flat arrays, so a step is a handful of NumPy operations instead of a walk through its organs and genes.
+Receptors become a gather of chemicals, emitters a scatter of chemicals, and reactions rows of a stoichiometry matrix. Within a step receptors only read concentrations (which don't change until the step ends) and emitters only read their own organ's parameters (which don't change until that organ updates), so every activation function output for the step can be worked out at once. Only the changes to chemicals have to happen in gene order, and only because reactions check what is there.
+"""
+import numpy as np
+from BioChemGene import REACTION_MAX
+from utilities import health_decay, health_decay_array, ActivationSet
+from Organ import PARAM_SLOTS, HEALTH, REACTION_RATE, ACT_RATE
+from Simulator import is_broken
+
+SCALAR_ORGANS = 16 # Fewer organs updating than this are quicker one at a time than through health_decay_array
+CHECK_TOLERANCE = 1e-9 # Relative difference allowed between the network and the organism in check mode. Adding chemicals up in a different order changes the last few bits
+
+class ReactionNetwork:
+    """
+    A compiled copy of a Body. Stepping it never changes the Body, except in check mode: then every step also runs the Body's own organs with the same rolls, and raises AssertionError as soon as the two disagree.
+    Like activate_organs, a step where an active organ has a gene whose activation function raises (a radical with radicand 0) raises ZeroDivisionError, and here nothing is changed
+    """
+    def __init__(self, body, check=False, rng=None):
+        if rng is None:
+            rng = np.random.default_rng()
+        self._rng = rng
+        self._body = body if check else None
+        organs = body.get_organs()
+        self._chems = np.array(body.get_chemicals(), dtype=float)
+        self._chem_view = memoryview(self._chems)
+        self._concentrations = np.array(body.get_concentrations(), dtype=float)
+        self._params = np.zeros((len(organs), len(PARAM_SLOTS)))
+        self._receptor_sums = np.zeros((len(organs), len(PARAM_SLOTS)))
+        self._receptor_counts = np.zeros((len(organs), len(PARAM_SLOTS)), dtype=np.int64)
+        self._broken_organs = np.zeros(len(organs), dtype=bool)
+        self._functions = ActivationSet()
+
+        receptors = []
+        emitters = []
+        reactions = []
+        broken = []
+        position = 0 # Where each gene comes in the whole organism, organ by organ
+        for k, organ in enumerate(organs):
+            self._params[k] = (organ.get_health(), organ.get_reaction_rate(), organ.get_act_rate())
+            for slot, (total, count) in enumerate(organ.get_receptor_totals()):
+                self._receptor_sums[k, slot] = total
+                self._receptor_counts[k, slot] = count
+            for gene in organ.get_genes():
+                position += 1
+                type = gene.get_type()
+                if type == 'reaction':
+                    reactions.append((k, position, gene.get_equation_params()[0], gene.get_chems_and_coefficients()))
+                    continue
+                function = gene.get_activation_function()
+                function_id = self._functions.add(function)
+                if function_id == len(broken):
+                    broken.append(is_broken(function))
+                self._broken_organs[k] |= broken[function_id]
+                values = (k, gene.get_chemical(), gene.get_slot(), function_id)
+                if type == 'receptor':
+                    receptors.append(values)
+                else:
+                    emitters.append(values + (gene.get_output_rate(), position))
+
+        receptors = np.array(receptors, dtype=np.int64).reshape(-1, 4)
+        self._receptor_organs = receptors[:, 0]
+        self._receptor_chems = receptors[:, 1]
+        self._receptor_slots = receptors[:, 2]
+        self._receptor_funcs = receptors[:, 3]
+
+        self._emitter_organs = np.array([e[0] for e in emitters], dtype=np.int64)
+        self._emitter_chems = np.array([e[1] for e in emitters], dtype=np.int64)
+        self._emitter_slots = np.array([e[2] for e in emitters], dtype=np.int64)
+        self._emitter_funcs = np.array([e[3] for e in emitters], dtype=np.int64)
+        self._emitter_rates = np.array([e[4] for e in emitters], dtype=float)
+        self._emitter_positions = np.array([e[5] for e in emitters], dtype=np.int64)
+
+        # Each reaction is a row of what it consumes and a row of what it produces, in the same gene order as here
+        self._table = body.get_reactions()
+        self._reaction_organs = np.array([r[0] for r in reactions], dtype=np.int64)
+        self._reaction_positions = [r[1] for r in reactions]
+        self._reactions = []
+        for k, position, left, chems in reactions:
+            # Stepping goes through each reaction's chemicals in order, which only differs from the matrices when a chemical runs out part way
+            equation = tuple((chemical, coefficient*(REACTION_MAX)/64) for coefficient, chemical in chems)
+            self._reactions.append((left, equation))
+
+    def step(self, rolls=None):
+        """
+        Advances the organism by one call of activate_organs. rolls is an optional array of one activation roll per organ to use instead of drawing them
+        """
+        if rolls is None:
+            rolls = self._rng.random(len(self._params))
+        active = rolls <= self._params[:, ACT_RATE]
+        if (active & self._broken_organs).any():
+            raise ZeroDivisionError("an active organ has an activation function that can't be evaluated")
+
+        picked = active[self._receptor_organs]
+        organs = self._receptor_organs[picked]
+        slots = self._receptor_slots[picked]
+        outputs = self._functions.evaluate(self._receptor_funcs[picked], self._concentrations[self._receptor_chems[picked]])
+        # np.add.at adds in index order, which is gene order
+        np.add.at(self._receptor_sums, (organs, slots), outputs)
+        np.add.at(self._receptor_counts, (organs, slots), 1)
+
+        picked = active[self._emitter_organs]
+        chems = self._emitter_chems[picked]
+        positions = self._emitter_positions[picked]
+        x = self._params[self._emitter_organs[picked], self._emitter_slots[picked]]
+        amounts = self._functions.evaluate(self._emitter_funcs[picked], x) * self._emitter_rates[picked]
+        self.release_and_react(chems, positions, amounts, np.flatnonzero(active[self._reaction_organs]))
+
+        self.update_params(np.flatnonzero(active))
+        total = sum(self._chem_view)
+        if total == 0:
+            total = 1
+        np.divide(self._chems, total, out=self._concentrations)
+        if self._body is not None:
+            self.check(rolls)
+
+    def run(self, steps):
+        for _ in range(steps):
+            self.step()
+
+    def release_and_react(self, chems, positions, amounts, reactions):
+        """
+        Adds the emitters' chemicals and runs the reactions, in gene order. There are only a few of each per organ, so this goes one at a time on plain floats, in exactly the order Emitter.release_chemical and Reaction.react would
+        """
+        view = self._chem_view
+        chems = chems.tolist()
+        amounts = amounts.tolist()
+        positions = positions.tolist()
+        e = 0
+        for r in reactions.tolist():
+            position = self._reaction_positions[r]
+            while e < len(positions) and positions[e] < position:
+                view[chems[e]] += amounts[e]
+                e += 1
+            left, equation = self._reactions[r]
+            if all(view[chemical] >= amount for chemical, amount in equation[:left]):
+                for i, (chemical, amount) in enumerate(equation):
+                    if i < left:
+                        # Consuming stops at 0, the same as Body.rem_chemical
+                        view[chemical] = max(view[chemical] - amount, 0)
+                    else:
+                        view[chemical] += amount
+        for e in range(e, len(positions)):
+            view[chems[e]] += amounts[e]
+
+    def update_params(self, organs):
+        """
+        Sets the parameters of the given organs from their receptor outputs, the same as InternalOrgan.update_params
+        """
+        means = self._receptor_sums[organs] / np.maximum(self._receptor_counts[organs], 1)
+        self._params[organs, REACTION_RATE] = means[:, REACTION_RATE]
+        self._params[organs, ACT_RATE] = means[:, ACT_RATE]
+        if len(organs) < SCALAR_ORGANS:
+            health = self._params[organs, HEALTH].tolist()
+            self._params[organs, HEALTH] = [health_decay(h, change) for h, change in zip(health, means[:, HEALTH].tolist())]
+        else:
+            self._params[organs, HEALTH] = health_decay_array(self._params[organs, HEALTH], means[:, HEALTH])
+
+    def check(self, rolls):
+        """
+        Steps the source Body with the same rolls and raises AssertionError if it no longer matches the network
+        """
+        body = self._body
+        for organ, roll in zip(body.get_organs(), rolls):
+            if roll <= organ.get_act_rate():
+                organ.activate_organ()
+        body.calc_concentrations()
+        params = [(organ.get_health(), organ.get_reaction_rate(), organ.get_act_rate()) for organ in body.get_organs()]
+        for name, ours, theirs in [('chemicals', self._chems, body.get_chemicals()),
+                                   ('concentrations', self._concentrations, body.get_concentrations()),
+                                   ('organ parameters', self._params, np.array(params).reshape(self._params.shape))]:
+            if not np.allclose(ours, theirs, rtol=CHECK_TOLERANCE, atol=CHECK_TOLERANCE):
+                raise AssertionError(f"compiled {name} {ours} differ from the organism's {theirs}")
+
+    def get_chemicals(self):
+        return self._chems
+
+    def get_concentrations(self):
+        return self._concentrations
+
+    def get_health(self):
+        return self._params[:, HEALTH]
+
+    def get_act_rates(self):
+        return self._params[:, ACT_RATE]
+
+    def get_reaction_rates(self):
+        return self._params[:, REACTION_RATE]
+
+    def get_stoichiometry(self):
+        """
+        Returns the reactions x chemicals matrix of net changes each reaction makes (when nothing it consumes runs out)
+        """
+        return self._table.get_stoichiometry()
+
+def compile_body(body, check=False, rng=None):
+    """
+    Returns a ReactionNetwork of the body. With check, stepping the network also steps the body and compares them (see ReactionNetwork)
+    """
+    return ReactionNetwork(body, check, rng)
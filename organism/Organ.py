@@ -3,14 +3,26 @@ A simple structure for prototyping
 """
 from utilities import *
 
+# Organ parameters, in the order _parameters lists them (so a gene's parameter index means the same thing)
+PARAM_SLOTS = ('health', 'reaction rate', 'activation rate')
+HEALTH = 0
+REACTION_RATE = 1
+ACT_RATE = 2
+SLOT_INDEX = {name: slot for slot, name in enumerate(PARAM_SLOTS)}
+
 class Organ:
     def __init__(self, type, owner):
         # Should probably have the owner referenced by ID to save space, then have a get_owner_by_id() to get the actual organism
         self._genes = []
         self._id = generate_id()
         self._owner = owner
-        self._health = 1
+        # Parameter values by slot. Genes read and adjust them by slot, resolved when they're decoded
+        self._params = [1, 0, 0]
+        # The slots in the order they were set up, which is what a gene's parameter index picks from
         self._parameters = []
+        # Receptor outputs for each parameter slot are kept as a running sum and count, which is all update_params needs of them
+        self._receptor_sums = [0.0] * len(PARAM_SLOTS)
+        self._receptor_counts = [0] * len(PARAM_SLOTS)
 
     def set_dna_head(self, node):
         self._dna_head = node
@@ -37,59 +49,92 @@ class InternalOrgan(Organ):
         """
         Sets the default health
         """
-        self._health = val
-        self._health_receptors = []
-        self._parameters.append(('health', self.health_adjust))
+        self._params[HEALTH] = val
+        self.clear_slot(HEALTH)
+        self._parameters.append(HEALTH)
     
     def set_act_rate(self, act_rate):
         """
         Determines how often this organ is activated
         """
-        self._act_rate = act_rate
-        self._act_rate_receptors = []
-        self._parameters.append(('activation rate', self.act_rate_adjust))
+        self._params[ACT_RATE] = act_rate
+        self.clear_slot(ACT_RATE)
+        self._parameters.append(ACT_RATE)
 
     def set_reaction_rate(self, rate):
-        self._reaction_rate = rate
-        self._reaction_rate_receptors = []
-        self._parameters.append(('reaction rate', self.reaction_rate_adjust))
+        self._params[REACTION_RATE] = rate
+        self.clear_slot(REACTION_RATE)
+        self._parameters.append(REACTION_RATE)
 
     def get_genes(self):
         return self._genes
         
     def debug_set_health(self, val):
-        self._health = max(min(val,1),0)
+        self._params[HEALTH] = max(min(val,1),0)
         
     def get_param_numbers(self):
         return len(self._parameters)
 
     def get_param_at_index(self, index):
+        """
+        Returns the slot of the index-th parameter set up
+        """
         return self._parameters[index]
 
+    def receive(self, slot, output):
+        """
+        Adds a receptor output to a parameter slot's running sum, which update_params averages
+        """
+        self._receptor_sums[slot] += output
+        self._receptor_counts[slot] += 1
+
     def read_health_from_gene(self, output):
         """
         This is passed to the gene(hopefully space efficient) and it should add the output to a queue, which is then averaged
         """
-        self._health_receptors.append(output)
+        self.receive(HEALTH, output)
 
     def read_act_rate_from_gene(self, output):
-        self._act_rate_receptors.append(output)
+        self.receive(ACT_RATE, output)
 
     def read_reaction_rate_from_gene(self, output):
-        self._reaction_rate_receptors.append(output)
+        self.receive(REACTION_RATE, output)
+
+    def get_receptor_totals(self):
+        """
+        Returns (sum, count) of the receptor outputs collected for each of health, reaction rate and activation rate, in the order of _parameters
+        """
+        return list(zip(self._receptor_sums, self._receptor_counts))
+
+    def set_receptor_totals(self, totals):
+        """
+        Sets the (sum, count) of every parameter slot, the reverse of get_receptor_totals
+        """
+        for slot, (total, count) in enumerate(totals):
+            self._receptor_sums[slot] = total
+            self._receptor_counts[slot] = count
+
+    def clear_slot(self, slot):
+        self._receptor_sums[slot] = 0.0
+        self._receptor_counts[slot] = 0
 
     def clear_receptors(self):
-        self._health_receptors = []
-        self._act_rate_receptors = []
-        self._reaction_rate_receptors = []
+        for slot in range(len(PARAM_SLOTS)):
+            self.clear_slot(slot)
     
     def get_parameter(self, param):
-        if param == 'health':
-            return self._health
-        if param == 'activation rate':
-            return self._act_rate
-        if param == 'reaction rate':
-            return self._reaction_rate
+        slot = SLOT_INDEX.get(param)
+        if slot is not None:
+            return self._params[slot]
+
+    def get_param(self, slot):
+        return self._params[slot]
+
+    def get_params(self):
+        """
+        Returns the parameter values by slot (not a copy)
+        """
+        return self._params
             
     def release_chemical(self, chemical, amount):
         self._owner.add_chemical(chemical, amount)
@@ -98,22 +143,22 @@ class InternalOrgan(Organ):
         self._owner.rem_chemical(chemical, amount)
 
     def health_adjust(self, value):
-        self._health_receptors.append(value)
+        self.receive(HEALTH, value)
 
     def act_rate_adjust(self, value):
-        self._health_receptors.append(value)
+        self.receive(ACT_RATE, value)
 
     def reaction_rate_adjust(self, value):
-        self._health_receptors.append(value)
+        self.receive(REACTION_RATE, value)
     
     def get_health(self):
-        return self._health
+        return self._params[HEALTH]
 
     def get_act_rate(self):
-        return self._act_rate
+        return self._params[ACT_RATE]
 
     def get_reaction_rate(self):
-        return self._reaction_rate
+        return self._params[REACTION_RATE]
 
     def get_concentration(self, chemical):
         return self._owner.get_concentration(chemical)
@@ -124,8 +169,12 @@ class InternalOrgan(Organ):
     def get_param_adjust(self, gene):
         return gene.adjust_parameter()
     
-    def activate_organ(self):
-        for gene in self._genes:
+    def activate_organ(self, react=True):
+        """
+        Runs every gene in order and then updates the parameters. With react=False reaction genes are skipped, for when the body resolves all its reactions together (see Body.set_batched_reactions)
+        """
+        genes = self._genes if react else [gene for gene in self._genes if gene.get_type() != 'reaction']
+        for gene in genes:
             self.activate_gene(gene)
         self.update_params()
     
@@ -136,21 +185,24 @@ class InternalOrgan(Organ):
         elif type == 'emitter':
             gene.release_chemical()
         elif type == 'reaction':
-            if gene.check_requirements():
+            if gene.check_for_requirements():
                 gene.react()
 
     def update_params(self):
-        self._reaction_rate = sum(self._reaction_rate_receptors) / max(len(self._reaction_rate_receptors),1)
-        self._act_rate = sum(self._act_rate_receptors) / max(len(self._act_rate_receptors), 1)
-        average_health_change = sum(self._health_receptors) / max(len(self._health_receptors), 1)
-        self._health = health_decay(self._health, average_health_change)
+        params = self._params
+        sums = self._receptor_sums
+        counts = self._receptor_counts
+        params[REACTION_RATE] = sums[REACTION_RATE] / max(counts[REACTION_RATE], 1)
+        params[ACT_RATE] = sums[ACT_RATE] / max(counts[ACT_RATE], 1)
+        average_health_change = sums[HEALTH] / max(counts[HEALTH], 1)
+        params[HEALTH] = health_decay(params[HEALTH], average_health_change)
         
     def describe(self):
         """
         Provide a readout on all aspects of the organ, including parameters and genes
         """
         s1 = f"Organ {self._id}:\n"
-        s2 = f"\t This organ has Health: {self._health}, Activation Rate: {self._act_rate}, Reaction Rate: {self._reaction_rate}\n"
+        s2 = f"\t This organ has Health: {self.get_health()}, Activation Rate: {self.get_act_rate()}, Reaction Rate: {self.get_reaction_rate()}\n"
         s3 = f"\t This organ has {len(self._genes)} genes:\n"
         print(s1, s2, s3)
         for gene in self._genes:
@@ -159,7 +211,7 @@ class InternalOrgan(Organ):
 
     def status(self):
         s1 = f"Organ{self._id}\n"
-        s2 = f"Health: {self._health}\n"
-        s3 = f"Activation Rate: {self._act_rate}\n"
-        s4 = f"Reaction Rate: {self._reaction_rate}\n"
+        s2 = f"Health: {self.get_health()}\n"
+        s3 = f"Activation Rate: {self.get_act_rate()}\n"
+        s4 = f"Reaction Rate: {self.get_reaction_rate()}\n"
         print(s1, s2, s3, s4)
@@ -0,0 +1,116 @@
+"""
+Every Reaction gene of an organism as one stoichiometry table, so they can be checked and applied together instead of one gene (and one chemical) at a time.
+"""
+import numpy as np
+import Chemicals
+from BioChemGene import REACTION_MAX
+
+class ReactionTable:
+    """
+    Row r of the table is the r-th reaction gene, in gene order across the organism's organs: consumed[r] is how much of each chemical it takes, produced[r] how much it gives, and organs[r] the index of the organ it belongs to.
+    Resolving a batch of reactions works from the quantities at the start of the batch. A reaction is feasible if there is enough of each chemical it consumes, entry by entry (the same test as Reaction.check_for_requirements): a chemical on the left twice only needs to cover the larger entry, required[r], though both are taken, down to 0, when it fires. When feasible reactions compete for a chemical, gene order decides: a reaction only fires if what it requires fits in what is left after everything the feasible reactions before it consume. Once a chemical runs short every later reaction needing it is left out, even one small enough to fit in what is left, so the outcome doesn't depend on trying reactions one at a time. Chemicals produced in a batch can't be consumed until the next one.
+    Quantities can be a single organism's (chemicals,) array or a (copies, chemicals) array of many copies of the organism, resolved together. Masks of active organs go with them: (organs,) or (copies, organs)
+    """
+    def __init__(self, organs, consumed, produced, required=None):
+        self._organs = np.asarray(organs, dtype=np.int64)
+        self._consumed = np.asarray(consumed, dtype=float).reshape(len(self._organs), Chemicals.NUM_CHEMS)
+        self._produced = np.asarray(produced, dtype=float).reshape(len(self._organs), Chemicals.NUM_CHEMS)
+        if required is None:
+            required = self._consumed
+        self._required = np.asarray(required, dtype=float).reshape(len(self._organs), Chemicals.NUM_CHEMS)
+        self._net = self._produced - self._consumed
+        # Only chemicals something consumes need checking
+        self._reactants = np.flatnonzero(self._consumed.any(axis=0))
+
+    @classmethod
+    def from_organs(cls, organs):
+        """
+        Builds the table of every reaction gene in a list of organs
+        """
+        rows = []
+        consumed = []
+        produced = []
+        required = []
+        for k, organ in enumerate(organs):
+            for gene in organ.get_genes():
+                if gene.get_type() != 'reaction':
+                    continue
+                left = gene.get_equation_params()[0]
+                taken = np.zeros(Chemicals.NUM_CHEMS)
+                given = np.zeros(Chemicals.NUM_CHEMS)
+                needs = np.zeros(Chemicals.NUM_CHEMS)
+                for c, (coefficient, chemical) in enumerate(gene.get_chems_and_coefficients()):
+                    if c < left:
+                        taken[chemical] += coefficient*(REACTION_MAX)/64
+                        needs[chemical] = max(needs[chemical], coefficient*(REACTION_MAX)/64)
+                    else:
+                        given[chemical] += coefficient*(REACTION_MAX)/64
+                rows.append(k)
+                consumed.append(taken)
+                produced.append(given)
+                required.append(needs)
+        return cls(rows, consumed, produced, required)
+
+    def __len__(self):
+        return len(self._organs)
+
+    def get_organs(self):
+        return self._organs
+
+    def get_consumed(self):
+        return self._consumed
+
+    def get_produced(self):
+        return self._produced
+
+    def get_required(self):
+        """
+        Returns how much of each chemical each reaction needs there to be to fire, its largest single entry of that chemical
+        """
+        return self._required
+
+    def get_stoichiometry(self):
+        """
+        Returns the reactions x chemicals matrix of net changes each reaction makes
+        """
+        return self._net
+
+    def feasible(self, quantities):
+        """
+        Returns which reactions have enough of everything they require in quantities, each on its own
+        """
+        quantities = np.asarray(quantities, dtype=float)
+        reactants = self._reactants
+        return (quantities[..., None, reactants] >= self._required[:, reactants]).all(axis=-1)
+
+    def resolve(self, quantities, active=None):
+        """
+        Returns which reactions fire on quantities, following the ordering policy above. active is an optional mask of the organs whose reactions can fire
+        """
+        quantities = np.asarray(quantities, dtype=float)
+        candidates = self.feasible(quantities)
+        if active is not None:
+            candidates &= np.asarray(active, dtype=bool)[..., self._organs]
+        taken = np.where(candidates[..., None], self._consumed[:, self._reactants], 0)
+        needed = self._required[:, self._reactants]
+        # What every candidate before each reaction takes, plus what that reaction requires, chemical by chemical. Every reaction requires at most what it takes, so once a chemical falls short it stays short
+        demand = np.cumsum(taken, axis=-2) - taken + needed
+        short = (demand > quantities[..., None, self._reactants]) & (needed > 0)
+        return candidates & ~short.any(axis=-1)
+
+    def apply(self, quantities, fired):
+        """
+        Takes what every fired reaction consumes from quantities, stopping at 0 like Body.rem_chemical, and then adds what they produce, in place. Consumption comes first, so a chemical a reaction both over-consumes (a repeated reactant) and produces ends up where Reaction.react leaves it
+        """
+        fired = fired.astype(float)
+        quantities -= fired @ self._consumed
+        np.maximum(quantities, 0, out=quantities)
+        quantities += fired @ self._produced
+
+    def react(self, quantities, active=None):
+        """
+        Resolves and applies one batch of reactions to quantities in place, returning which fired
+        """
+        fired = self.resolve(quantities, active)
+        self.apply(quantities, fired)
+        return fired
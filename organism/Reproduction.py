@@ -5,41 +5,78 @@ from Body import *
 from Constructor import *
 from utilities import *
 from Genome import *
+from GenomeIndex import GenomeIndex
+import numpy as np
 import random
 
 MUTATION_RATE = .01
 START_FLIP_DIVISOR = 20
 PARAM_FLIP_DIVISOR = 4
 NON_CODING_DIVISOR = 1
+DENSE_SITES = 4 # sample_sites picks more flips than 1 in this many bits with rng.choice, which is quicker than redrawing repeats by then
 
 # Genome parsing - possible combine this with decoder, that would mean genome is read once. Maybe having the Genome parsed into a directed graph would be easier?
 
 # PARTHENOGENIC METHODS
 def flip_at(pos, strand):
+    """
+    Returns a copy of strand with the bit at pos flipped. Works on a PackedGenome or the byte string form
+    """
+    if isinstance(strand, PackedGenome):
+        strand = strand.copy()
+        strand.flip(pos)
+        return strand
     val = int(strand[pos])-48
     chg = val^1
     strand = strand[:pos]+chr(chg+48).encode('utf-8')+strand[pos+1:]
     return strand
 
-def flip_segment(segment, mutation_rate=MUTATION_RATE, divisor=1):
-    count = 0
-    for i in range(len(segment)):
-        odds = (1 -(mutation_rate/divisor)) ** len(segment)
-        roll = random.random()
-        while roll > odds:
-            count += 1
-            odds = (1 -(mutation_rate/divisor)) ** (len(segment)-count)
-            roll = random.random()
-        count = min(count, len(segment))
-        choices = random.sample(range(len(segment)),count)
-        for i in choices:
-            segment = flip_at(i, segment)
-        """
-        for _ in range(len(count)):
-            index = random.choice(range(len(segment)))
-            segment = flip_at(index, segment)
-        """
-    return segment
+def flip_all(positions, strand):
+    """
+    Returns a copy of strand with the bit at every position flipped, all in one pass. Works on a PackedGenome or the byte string form, and returns the same form
+    """
+    packed = pack_genome(strand, copy=True)
+    packed.flip_many(positions)
+    if isinstance(strand, PackedGenome):
+        return packed
+    return packed.to_bytes()
+
+def seeded_rng():
+    """
+    Returns a NumPy Generator seeded from the random module, so random.seed still makes mutations reproducible when no rng is passed
+    """
+    return np.random.default_rng(random.getrandbits(64))
+
+def sample_sites(length, rate, rng=None):
+    """
+    Picks which of length bits flip when each flips with probability rate, and returns their sorted positions. The number of flips is drawn from a binomial and the positions without replacement, which is the same distribution as rolling every bit but only takes a couple of draws
+    """
+    if rng is None:
+        rng = seeded_rng()
+    return choose_sites(length, rng.binomial(length, min(max(rate, 0), 1)), rng)
+
+def choose_sites(length, count, rng):
+    """
+    Returns count different positions below length, sorted, with every set of count positions equally likely
+    """
+    if count == 0:
+        return np.zeros(0, dtype=np.int64)
+    if count * DENSE_SITES > length:
+        return np.sort(rng.choice(length, count, replace=False))
+    # Sparse flips: draw positions with replacement and draw again for any repeats. The result is always the first count different positions of a run of uniform draws, so no set of positions is favoured
+    sites = np.sort((rng.random(count) * length).astype(np.int64))
+    while True:
+        repeated = sites[1:] == sites[:-1]
+        if not repeated.any():
+            return sites
+        redraws = (rng.random(int(repeated.sum())) * length).astype(np.int64)
+        sites = np.sort(np.concatenate((sites[:1], sites[1:][~repeated], redraws)))
+
+def flip_segment(segment, mutation_rate=MUTATION_RATE, divisor=1, rng=None):
+    """
+    Returns a copy of segment where each bit has flipped with probability mutation_rate/divisor
+    """
+    return flip_all(sample_sites(len(segment), mutation_rate/divisor, rng), segment)
 
 def increment_frame(frame, val=1):
     """
@@ -70,65 +107,112 @@ def random_bit_flip(organism, mutation_rate = MUTATION_RATE):
             genome = bit_flip(genome, i)
     return genome
 
-def random_bit_flip_string(organism, mutation_rate = MUTATION_RATE):
+def random_bit_flip_string(organism, mutation_rate = MUTATION_RATE, rng=None):
     """
-    Performs random bit flipping across genome, but treats genome as string instead. More promising I think. Assumes byt string returned
+    Performs random bit flipping across genome, but treats genome as string instead. More promising I think. Flips happen in place on a packed copy of the genome, which is returned
     """
-    genome = organism.get_genome()
-    for i in range(len(genome)):
-        if random.random() < mutation_rate:
-            genome = flip_at(i, genome)
-    return genome
+    return MutationEngine.from_organism(organism, mutation_rate, rng).mutate(UNIFORM)
     
-def bit_flip_in_params(organism, mutation_rate = MUTATION_RATE):
+def bit_flip_in_params(organism, mutation_rate = MUTATION_RATE, rng=None):
     """
-    performs random bit flipping only on structures (does not flip OpCodes
-    Add testing to ensure that structure is preserved.
+    performs random bit flipping only on structures parameters (does not flip OpCodes or non coding sections), so the structures are preserved. Returns a packed copy of the genome
     """
-    organ_string = b''
-    for organ in organism.get_organs():
-        node= organ.get_dna_head()
-        params = node.get_params()
-        for i in range(len(params)):
-            if random.random() < mutation_rate:
-                params = flip_at(i, params)
-        organ_string += params
-        organ_string = organ_string + node.get_start() + params + node.get_noncoding()
-        for gene in organ.get_genes():
-            node = gene.get_dna_head()
-            params = node.get_params()
-            for i in range(len(params)):
-                if random.random() < mutation_rate:
-                    params = flip_at(i, params)
-            organ_string += node.get_start() + params + node.get_noncoding()
-    genome = organism.get_dna_head().get_noncoding()+organ_string
-    return genome
+    return MutationEngine.from_organism(organism, mutation_rate, rng).mutate(PARAMS)
     
-def bit_flip_weighted(organism, mutation_rate = MUTATION_RATE):
+def bit_flip_weighted(organism, mutation_rate = MUTATION_RATE, rng=None):
     """
-    Performs bit flipped on genome, but more strongly weighted for non coding sections
-    Instead of checking every bit, lets just roll against the whole string? If it has length of 20, then its 1- odds ^ 20
+    Performs bit flipped on genome, but more strongly weighted for non coding sections. Each region's bits flip at mutation_rate over its divisor. Returns a packed copy of the genome
     """
-    genome = b''
-    node = organism.get_dna_head()
-    while node.next:
-        start = node.get_start()
-        if start is None:
-            start = b''
-        params = node.get_params()
-        if params is None:
-            params = b''
-        noncoding = node.get_noncoding()
-        if noncoding is None:
-            noncoding = b''
-        start = flip_segment(start, mutation_rate, START_FLIP_DIVISOR)
-        params = flip_segment(params, mutation_rate, PARAM_FLIP_DIVISOR)
-        noncoding = flip_segment(noncoding, mutation_rate, NON_CODING_DIVISOR)
-        
-        genome += start+params+noncoding
-        node = node.next
-    return genome
+    return MutationEngine.from_organism(organism, mutation_rate, rng).mutate(WEIGHTED)
+
+# Point mutation strategies of MutationEngine
+UNIFORM = 'uniform'
+PARAMS = 'params'
+WEIGHTED = 'weighted'
 
+class MutationEngine:
+    """
+    Point mutations of one parent genome, for making many offspring from it. The parent's regions (every bit, the parameters, or opcodes, parameters and non coding sections at their own rates) are worked out once from its GenomeIndex, and each offspring is a copy of the parent's packed bits with all of its flips applied in one pass.
+    get_sites and apply can also be used separately, e.g. to hand the flipped positions to DecoderLinkedList.read_genome_from_parent
+    """
+    def __init__(self, index, mutation_rate=MUTATION_RATE, rng=None):
+        if rng is None:
+            rng = seeded_rng()
+        self._rng = rng
+        self._index = index
+        self._genome = index.get_genome()
+        self._mutation_rate = mutation_rate
+        self._regions = {}
+
+    @classmethod
+    def from_organism(cls, organism, mutation_rate=MUTATION_RATE, rng=None):
+        """
+        Builds the engine for a decoded organism. Its nodes hold the whole genome, and an organism without organs (so without nodes) is one non coding head over the genome it was decoded from
+        """
+        head = organism.get_dna_head()
+        if head is not None:
+            index = GenomeIndex.from_nodes(head)
+        else:
+            genome = organism.get_genome()
+            if not genome:
+                raise ValueError("the organism has no genome to mutate")
+            genome = pack_genome(genome)
+            index = GenomeIndex(genome, [0], [0], [0], [0], [len(genome)])
+        return cls(index, mutation_rate, rng)
+
+    def get_index(self):
+        return self._index
+
+    def get_regions(self, strategy):
+        """
+        Returns [(positions, rate)] of the regions a strategy mutates: each bit at positions flips with probability rate
+        """
+        if strategy not in self._regions:
+            index = self._index
+            rate = self._mutation_rate
+            if strategy == UNIFORM:
+                regions = [(np.arange(len(self._genome)), rate)]
+            elif strategy == PARAMS:
+                regions = [(index.get_span_positions(index.get_params_spans()), rate)]
+            elif strategy == WEIGHTED:
+                regions = [(index.get_span_positions(index.get_start_spans()), rate/START_FLIP_DIVISOR),
+                           (index.get_span_positions(index.get_params_spans()), rate/PARAM_FLIP_DIVISOR),
+                           (index.get_span_positions(index.get_noncoding_spans()), rate/NON_CODING_DIVISOR)]
+            else:
+                raise ValueError(f"unknown mutation strategy {strategy}")
+            self._regions[strategy] = regions
+        return self._regions[strategy]
+
+    def get_sites(self, strategy=UNIFORM):
+        """
+        Returns the sorted positions one offspring has flipped under a strategy. Each region's flips are a binomial count and a sample of positions (as in sample_sites), rather than a roll per bit
+        """
+        rng = self._rng
+        sites = []
+        for positions, rate in self.get_regions(strategy):
+            count = rng.binomial(len(positions), rate)
+            if count:
+                sites.append(positions[choose_sites(len(positions), count, rng)])
+        if not sites:
+            return np.zeros(0, dtype=np.int64)
+        if len(sites) == 1:
+            return sites[0]
+        return np.sort(np.concatenate(sites))
+
+    def apply(self, sites, genome=None):
+        """
+        Flips sites in genome in place, or in a copy of the parent if no genome is given, and returns it
+        """
+        if genome is None:
+            genome = self._genome.copy()
+        genome.flip_many(sites)
+        return genome
+
+    def mutate(self, strategy=UNIFORM, genome=None):
+        """
+        Returns an offspring of the parent with point mutations under a strategy
+        """
+        return self.apply(self.get_sites(strategy), genome)
 
 def insert_to_preserve_order(organism, mutation_rate = MUTATION_RATE):
     """
@@ -177,18 +261,15 @@ def retrotransposition(organism, mutation_rate=MUTATION_RATE):
     while node:
         if random.random() < mutation_rate:
             if new_node is None:
-                new_node = Node()
-                new_node.set_start(node.get_start())
-                new_node.set_params(node.get_params())
-                new_node.set_noncoding(node.get_noncoding())
+                new_node = node.copy()
             else:
                 new_node.next = node.next
                 non_coding = node.get_noncoding()
                 place = random.choice(range(len(non_coding)))
                 part_a = non_coding[:place]
                 part_b = non_coding[place+1:]
-                node.set_noncoding = part_a
-                new_node.set_noncoding = new_node.get_noncoding() + part_b
+                node.set_noncoding(part_a)
+                new_node.set_noncoding(new_node.get_noncoding() + part_b)
                 node.next = new_node
                 new_node = None
                 node = node.next
@@ -219,14 +300,43 @@ def duplication(organism, mutation_rate=MUTATION_RATE):
     node = prev_node.next
     while node:
         if random.random() < mutation_rate:
-            new_node = Node()
-            new_node.set_start(node.get_start())
-            new_node.set_params(node.get_params())
-            new_node.set_noncoding(node.get_noncoding())
+            new_node = node.copy()
             new_node.next = node.next
             node.next = new_node
         node = node.next
     
+# The same structural mutations on a GenomeIndex. Structures are picked all at once and the new genome is built in one pass, rather than walking (and re-walking) the linked list
+
+def indexed_retrotransposition(index, mutation_rate=MUTATION_RATE, rng=None):
+    """
+    Copies each picked structure and pastes the copy after a randomly chosen structure. Returns a new GenomeIndex
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    picked = index.select(mutation_rate, rng)
+    if len(picked) == 0:
+        return index
+    targets = rng.integers(1, len(index), size=len(picked))
+    return index.transpose(picked, targets)
+
+def indexed_deletion(index, mutation_rate=MUTATION_RATE, rng=None):
+    """
+    Deletes each picked structure. Returns a new GenomeIndex
+    """
+    picked = index.select(mutation_rate, rng)
+    if len(picked) == 0:
+        return index
+    return index.delete(picked)
+
+def indexed_duplication(index, mutation_rate=MUTATION_RATE, rng=None):
+    """
+    Places a copy of each picked structure right after it. Returns a new GenomeIndex
+    """
+    picked = index.select(mutation_rate, rng)
+    if len(picked) == 0:
+        return index
+    return index.duplicate(picked)
+    
 def point_deletion(organism, mutation_rate= MUTATION_RATE):
     """
     deletes a number of bits, preserve reading frame
@@ -0,0 +1,264 @@
+"""
+Steps a whole population of organisms at once.
+Body.activate_organs walks one organism's object graph at a time. PopulationSimulator copies the state of many Bodies into arrays (chemicals as an organisms x chemicals matrix, organ parameters and genes as organisms x organs (x genes) arrays) and advances all of them together, one organ slot and gene slot at a time, so the order things happen in each organism is the same as in activate_organs.
+"""
+import numpy as np
+import Chemicals
+from BioChemGene import REACTION_MAX
+from utilities import health_decay_array, ActivationSet
+
+from Organ import PARAM_SLOTS, HEALTH, REACTION_RATE, ACT_RATE
+
+# Gene kinds in the gene arrays
+NO_GENE = -1
+RECEPTOR = 0
+EMITTER = 1
+REACTION = 2
+GENE_KINDS = {'receptor': RECEPTOR, 'emitter': EMITTER, 'reaction': REACTION}
+MAX_REACTION_CHEMS = 4 # At most 2 chemicals on the left and 2 on the right
+
+def is_broken(function):
+    """
+    Some parameters make an activation function that raises whenever it's called (a radical with radicand 0)
+    """
+    try:
+        function(.5)
+    except ZeroDivisionError:
+        return True
+    return False
+
+class PopulationSimulator:
+    """
+    Holds the state of a list of Bodies as arrays and steps them all together. The Bodies themselves are only read when the simulator is made, never changed.
+    Each step is one call of activate_organs for every organism: organs are rolled against their activation rate in order, active organs run their genes in order, and concentrations are recalculated at the end. Like activate_organs, a gene whose activation function can't be evaluated stops its organism; those organisms are marked as failed and left as they were from then on
+    """
+    def __init__(self, bodies, rng=None):
+        if rng is None:
+            rng = np.random.default_rng()
+        self._rng = rng
+        count = len(bodies)
+        organ_lists = [body.get_organs() for body in bodies]
+        max_organs = max([len(organs) for organs in organ_lists] + [1])
+        max_genes = max([len(organ.get_genes()) for organs in organ_lists for organ in organs] + [1])
+        self._count = count
+        self._chems = np.array([body.get_chemicals() for body in bodies], dtype=float).reshape(count, Chemicals.NUM_CHEMS)
+        self._concentrations = np.array([body.get_concentrations() for body in bodies], dtype=float).reshape(count, Chemicals.NUM_CHEMS)
+        self._organ_counts = np.array([len(organs) for organs in organ_lists], dtype=np.int64)
+        self._failed = np.zeros(count, dtype=bool)
+
+        shape = (count, max_organs)
+        self._params = np.zeros(shape + (len(PARAM_SLOTS),))
+        self._receptor_sums = np.zeros(shape + (len(PARAM_SLOTS),))
+        self._receptor_counts = np.zeros(shape + (len(PARAM_SLOTS),), dtype=np.int64)
+
+        shape = (count, max_organs, max_genes)
+        self._gene_counts = np.zeros((count, max_organs), dtype=np.int64)
+        self._gene_types = np.full(shape, NO_GENE, dtype=np.int8)
+        self._gene_funcs = np.zeros(shape, dtype=np.int64)
+        self._gene_chems = np.zeros(shape, dtype=np.int64)
+        self._gene_slots = np.zeros(shape, dtype=np.int64)
+        self._gene_rates = np.zeros(shape)
+        self._reaction_lefts = np.zeros(shape, dtype=np.int64)
+        self._reaction_sizes = np.zeros(shape, dtype=np.int64)
+        self._reaction_amounts = np.zeros(shape + (MAX_REACTION_CHEMS,))
+        self._reaction_chems = np.zeros(shape + (MAX_REACTION_CHEMS,), dtype=np.int64)
+
+        # Activation functions are numbered in the order they're first seen. Decoded genes share interned functions, so there are far fewer of these than genes
+        self._functions = ActivationSet()
+        self._broken = []
+        for i, organs in enumerate(organ_lists):
+            for k, organ in enumerate(organs):
+                self.load_organ(i, k, organ)
+        self._broken = np.array(self._broken, dtype=bool)
+        uses_function = (self._gene_types == RECEPTOR) | (self._gene_types == EMITTER)
+        self._gene_broken = uses_function & self._broken[self._gene_funcs] if len(self._broken) else np.zeros(shape, dtype=bool)
+
+    def load_organ(self, i, k, organ):
+        """
+        Copies one organ, and its genes, into organ slot k of organism i
+        """
+        self._params[i, k] = (organ.get_health(), organ.get_reaction_rate(), organ.get_act_rate())
+        for slot, (total, count) in enumerate(organ.get_receptor_totals()):
+            self._receptor_sums[i, k, slot] = total
+            self._receptor_counts[i, k, slot] = count
+        genes = organ.get_genes()
+        self._gene_counts[i, k] = len(genes)
+        for g, gene in enumerate(genes):
+            kind = GENE_KINDS[gene.get_type()]
+            self._gene_types[i, k, g] = kind
+            if kind == REACTION:
+                chems = gene.get_chems_and_coefficients()
+                self._reaction_lefts[i, k, g] = gene.get_equation_params()[0]
+                self._reaction_sizes[i, k, g] = len(chems)
+                for c, (coefficient, chemical) in enumerate(chems):
+                    self._reaction_amounts[i, k, g, c] = coefficient*(REACTION_MAX)/64
+                    self._reaction_chems[i, k, g, c] = chemical
+                continue
+            self._gene_funcs[i, k, g] = self.get_function_id(gene.get_activation_function())
+            self._gene_chems[i, k, g] = gene.get_chemical()
+            self._gene_slots[i, k, g] = gene.get_slot()
+            if kind == EMITTER:
+                self._gene_rates[i, k, g] = gene.get_output_rate()
+
+    def get_function_id(self, function):
+        function_id = self._functions.add(function)
+        if function_id == len(self._broken):
+            self._broken.append(is_broken(function))
+        return function_id
+
+    def evaluate(self, function_ids, x):
+        return self._functions.evaluate(function_ids, x)
+
+    def step(self, rolls=None):
+        """
+        Advances every organism by one call of activate_organs. rolls is an optional organisms x organ slots array to use as the activation rolls instead of drawing them
+        """
+        if rolls is None:
+            rolls = self._rng.random(self._params.shape[:2])
+        running = ~self._failed
+        for k in range(self._params.shape[1]):
+            active = np.flatnonzero(running & (k < self._organ_counts) & (rolls[:, k] <= self._params[:, k, ACT_RATE]))
+            if len(active) == 0:
+                continue
+            active = self.activate_organs(active, k)
+            self.update_params(active, k)
+            running[self._failed] = False
+        # The organisms that failed this step never got to recalculate
+        self.calc_concentrations(np.flatnonzero(~self._failed))
+
+    def run(self, steps):
+        for _ in range(steps):
+            self.step()
+
+    def activate_organs(self, rows, k):
+        """
+        Runs every gene of organ slot k for the given organisms, the vectorized InternalOrgan.activate_organ (without update_params). Returns the organisms still running.
+        Receptors only read concentrations, which don't change until the step ends, and emitters only read the organ's parameters, which don't change until update_params, so every activation function output is worked out in one go. Only adding chemicals has to follow gene order, and only in organisms where a reaction in the organ might read them
+        """
+        genes = int(self._gene_counts[rows, k].max())
+        if genes == 0:
+            return rows
+        types = self._gene_types[rows, k, :genes]
+        funcs = self._gene_funcs[rows, k, :genes]
+        chems = self._gene_chems[rows, k, :genes]
+        # Genes from the first broken one on never run, and their organism fails
+        broken = self._gene_broken[rows, k, :genes]
+        failing = broken.any(axis=1)
+        runs = np.arange(genes) < np.where(failing, broken.argmax(axis=1), genes)[:, None]
+        receptors = runs & (types == RECEPTOR)
+        emitters = runs & (types == EMITTER)
+        reactions = runs & (types == REACTION)
+
+        slots = self._gene_slots[rows, k, :genes]
+        x = np.where(receptors, self._concentrations[rows[:, None], chems], 0)
+        x[emitters] = self._params[rows[:, None], k, slots][emitters]
+        uses_function = receptors | emitters
+        outputs = np.zeros(types.shape)
+        outputs[uses_function] = self.evaluate(funcs[uses_function], x[uses_function])
+        # Each receptor output goes to its own parameter slot. Adding 0 for the other genes leaves the sums exactly as if only receptors were added, in gene order
+        received = np.where(receptors, outputs, 0)
+        for g in range(genes):
+            self._receptor_sums[rows, k, slots[:, g]] += received[:, g]
+            self._receptor_counts[rows, k, slots[:, g]] += receptors[:, g]
+
+        amounts = np.where(emitters, outputs * self._gene_rates[rows, k, :genes], 0)
+        reacting = reactions.any(axis=1)
+        # np.add.at adds in index order, which is gene order within each organism
+        plain, slots = np.nonzero(emitters & ~reacting[:, None])
+        np.add.at(self._chems, (rows[plain], chems[plain, slots]), amounts[plain, slots])
+        ordered = np.flatnonzero(reacting)
+        for g in range(genes):
+            picked = ordered[emitters[ordered, g]]
+            self._chems[rows[picked], chems[picked, g]] += amounts[picked, g]
+            picked = ordered[reactions[ordered, g]]
+            if len(picked):
+                self.react(rows[picked], k, g)
+
+        self._failed[rows[failing]] = True
+        return rows[~failing]
+
+    def react(self, rows, k, g):
+        """
+        Runs the reactions in gene slot g of organ slot k, for the organisms that have enough of every chemical on the left
+        """
+        lefts = self._reaction_lefts[rows, k, g]
+        sizes = self._reaction_sizes[rows, k, g]
+        amounts = self._reaction_amounts[rows, k, g]
+        chems = self._reaction_chems[rows, k, g]
+        ready = np.ones(len(rows), dtype=bool)
+        for c in range(2):
+            left = c < lefts
+            ready &= ~left | (self._chems[rows, chems[:, c]] >= amounts[:, c])
+        rows, lefts, sizes, amounts, chems = rows[ready], lefts[ready], sizes[ready], amounts[ready], chems[ready]
+        # One chemical at a time, in order, so a chemical on both sides ends up the same as in Reaction.react
+        for c in range(int(sizes.max(initial=0))):
+            consume = c < lefts
+            release = ~consume & (c < sizes)
+            quantities = self._chems[rows, chems[:, c]]
+            quantities = np.where(consume, np.maximum(quantities - amounts[:, c], 0), np.where(release, quantities + amounts[:, c], quantities))
+            self._chems[rows, chems[:, c]] = quantities
+
+    def update_params(self, rows, k):
+        """
+        Sets the parameters of organ slot k from its receptor outputs, the same as InternalOrgan.update_params
+        """
+        means = self._receptor_sums[rows, k] / np.maximum(self._receptor_counts[rows, k], 1)
+        self._params[rows, k, REACTION_RATE] = means[:, REACTION_RATE]
+        self._params[rows, k, ACT_RATE] = means[:, ACT_RATE]
+        self._params[rows, k, HEALTH] = health_decay_array(self._params[rows, k, HEALTH], means[:, HEALTH])
+
+    def calc_concentrations(self, rows):
+        # Added up one chemical at a time, the same order Body.calc_concentrations adds them
+        chems = self._chems[rows]
+        total = np.zeros(len(rows))
+        for c in range(chems.shape[1]):
+            total += chems[:, c]
+        total[total == 0] = 1
+        self._concentrations[rows] = chems / total[:, None]
+
+    def get_state(self):
+        """
+        Returns every array of running state: (organ counts, failed, chemicals, concentrations, parameters, receptor sums, receptor counts)
+        """
+        return (self._organ_counts, self._failed, self._chems, self._concentrations, self._params, self._receptor_sums, self._receptor_counts)
+
+    def set_state(self, failed, chems, concentrations, params, receptor_sums, receptor_counts):
+        """
+        Copies running state (as get_state returns it, without the organ counts) into the simulator, which has to hold the same organisms
+        """
+        self._failed[:] = failed
+        self._chems[:] = chems
+        self._concentrations[:] = concentrations
+        self._params[:] = params
+        self._receptor_sums[:] = receptor_sums
+        self._receptor_counts[:] = receptor_counts
+
+    def get_chemicals(self):
+        """
+        Returns the organisms x chemicals array of quantities
+        """
+        return self._chems
+
+    def get_concentrations(self):
+        return self._concentrations
+
+    def get_health(self):
+        """
+        Returns the organisms x organ slots array of organ health. Slots past an organism's last organ are 0
+        """
+        return self._params[:, :, HEALTH]
+
+    def get_act_rates(self):
+        return self._params[:, :, ACT_RATE]
+
+    def get_reaction_rates(self):
+        return self._params[:, :, REACTION_RATE]
+
+    def get_organ_counts(self):
+        return self._organ_counts
+
+    def get_failed(self):
+        """
+        Returns which organisms stopped because a gene's activation function raised
+        """
+        return self._failed
@@ -0,0 +1,167 @@
+"""
+Saves and restores the running state of one body, a list of bodies, or a PopulationSimulator: chemical quantities and concentrations, every organ's health, reaction rate and activation rate, and the receptor sums and counts update_params averages.
+A snapshot is one binary file: a fixed size header and then each array in a fixed order, every one starting on an ALIGNMENT byte boundary. Loading maps the arrays straight out of the file with np.memmap, so even a snapshot of a huge population opens without reading, let alone parsing, anything per organism.
+Only the state is saved, not the organisms themselves. To restore, decode the same genomes again (or build the same simulator) and write the state back into them.
+"""
+import os
+import struct
+import numpy as np
+import Chemicals
+from Organ import PARAM_SLOTS
+
+MAGIC = b'ORGSNAP\0'
+VERSION = 1
+HEADER = struct.Struct('<8sIIqqqq') # magic, version, flags (unused, 0), organisms, chemicals, organ slots, parameter slots
+ALIGNMENT = 64
+
+def snapshot_layout(count, chems, organs, slots):
+    """
+    Returns [(name, dtype, shape, offset)] of every array in a snapshot of this size, in file order, and the size of the whole file
+    """
+    arrays = [('organ_counts', np.int64, (count,)),
+              ('failed', np.uint8, (count,)),
+              ('chemicals', np.float64, (count, chems)),
+              ('concentrations', np.float64, (count, chems)),
+              ('params', np.float64, (count, organs, slots)),
+              ('receptor_sums', np.float64, (count, organs, slots)),
+              ('receptor_counts', np.int64, (count, organs, slots))]
+    layout = []
+    offset = HEADER.size
+    for name, dtype, shape in arrays:
+        offset += (-offset) % ALIGNMENT
+        layout.append((name, dtype, shape, offset))
+        offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return layout, offset
+
+def write_snapshot(path, organ_counts, failed, chemicals, concentrations, params, receptor_sums, receptor_counts):
+    """
+    Writes the arrays of a snapshot. The file is written next to path and then moved over it, so a snapshot being written never replaces a good one with half of a new one
+    """
+    count, organs, slots = np.shape(params)
+    chems = np.shape(chemicals)[1]
+    layout, size = snapshot_layout(count, chems, organs, slots)
+    values = {'organ_counts': organ_counts, 'failed': failed, 'chemicals': chemicals, 'concentrations': concentrations,
+              'params': params, 'receptor_sums': receptor_sums, 'receptor_counts': receptor_counts}
+    temporary = f"{path}.tmp"
+    with open(temporary, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, 0, count, chems, organs, slots))
+        for name, dtype, shape, offset in layout:
+            file.write(b'\0' * (offset - file.tell()))
+            array = np.ascontiguousarray(values[name], dtype=dtype).reshape(shape)
+            file.write(memoryview(array).cast('B'))
+    os.replace(temporary, path)
+    return size
+
+def save_bodies(path, bodies):
+    """
+    Writes a snapshot of a list of Bodies (organism i of the snapshot is bodies[i])
+    """
+    count = len(bodies)
+    organs = max([len(body.get_organs()) for body in bodies] + [0])
+    slots = len(PARAM_SLOTS)
+    params = np.zeros((count, organs, slots))
+    sums = np.zeros((count, organs, slots))
+    counts = np.zeros((count, organs, slots), dtype=np.int64)
+    for i, body in enumerate(bodies):
+        for k, organ in enumerate(body.get_organs()):
+            params[i, k] = organ.get_params()
+            for slot, (total, received) in enumerate(organ.get_receptor_totals()):
+                sums[i, k, slot] = total
+                counts[i, k, slot] = received
+    chemicals = np.array([body.get_chemicals() for body in bodies]).reshape(count, Chemicals.NUM_CHEMS)
+    concentrations = np.array([body.get_concentrations() for body in bodies]).reshape(count, Chemicals.NUM_CHEMS)
+    organ_counts = [len(body.get_organs()) for body in bodies]
+    return write_snapshot(path, organ_counts, np.zeros(count, dtype=np.uint8), chemicals, concentrations, params, sums, counts)
+
+def save_body(path, body):
+    return save_bodies(path, [body])
+
+def save_simulator(path, simulator):
+    """
+    Writes a snapshot of every organism in a PopulationSimulator
+    """
+    return write_snapshot(path, *simulator.get_state())
+
+class Snapshot:
+    """
+    A loaded snapshot. Its arrays are memory mapped read only (or, with mmap=False, read into memory), and indexed by organism first
+    """
+    def __init__(self, arrays):
+        self._arrays = arrays
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(path, 'rb') as file:
+            header = file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError(f"{path} is too short to be a snapshot")
+        magic, version, flags, count, chems, organs, slots = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a snapshot")
+        if version != VERSION:
+            raise ValueError(f"snapshot version {version} is not supported (expected {VERSION})")
+        layout, size = snapshot_layout(count, chems, organs, slots)
+        if os.path.getsize(path) < size:
+            raise ValueError(f"{path} is truncated")
+        arrays = {}
+        for name, dtype, shape, offset in layout:
+            if 0 in shape:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            elif mmap:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape)
+            else:
+                arrays[name] = np.fromfile(path, dtype=dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+        return cls(arrays)
+
+    def __len__(self):
+        return len(self._arrays['organ_counts'])
+
+    def get_organ_counts(self):
+        return self._arrays['organ_counts']
+
+    def get_failed(self):
+        return self._arrays['failed'].astype(bool)
+
+    def get_chemicals(self):
+        return self._arrays['chemicals']
+
+    def get_concentrations(self):
+        return self._arrays['concentrations']
+
+    def get_params(self):
+        """
+        Returns the organisms x organ slots x parameter slots array of organ parameters, in the order of PARAM_SLOTS
+        """
+        return self._arrays['params']
+
+    def get_receptor_sums(self):
+        return self._arrays['receptor_sums']
+
+    def get_receptor_counts(self):
+        return self._arrays['receptor_counts']
+
+    def restore_body(self, body, i=0):
+        """
+        Writes organism i's state into body, which has to have the same organs (decoded from the same genome)
+        """
+        organs = body.get_organs()
+        if len(organs) != self._arrays['organ_counts'][i]:
+            raise ValueError(f"the body has {len(organs)} organs but organism {i} of the snapshot has {self._arrays['organ_counts'][i]}")
+        body.get_chemicals()[:] = self._arrays['chemicals'][i]
+        body.get_concentrations()[:] = self._arrays['concentrations'][i]
+        for k, organ in enumerate(organs):
+            organ.get_params()[:] = self._arrays['params'][i, k].tolist()
+            organ.set_receptor_totals(zip(self._arrays['receptor_sums'][i, k].tolist(), self._arrays['receptor_counts'][i, k].tolist()))
+
+    def restore_bodies(self, bodies):
+        for i, body in enumerate(bodies):
+            self.restore_body(body, i)
+
+    def restore_simulator(self, simulator):
+        """
+        Writes the whole snapshot into a PopulationSimulator made of the same organisms
+        """
+        simulator.set_state(self.get_failed(), self.get_chemicals(), self.get_concentrations(), self.get_params(), self.get_receptor_sums(), self.get_receptor_counts())
+
+def load_snapshot(path, mmap=True):
+    return Snapshot.load(path, mmap)
@@ -0,0 +1,115 @@
+"""
+Convergence monitoring for long runs. Once a body's chemistry settles down (concentrations and organ parameters stop changing beyond noise) stepping it at full cost is mostly wasted, so a monitored body is fast-forwarded instead until something disturbs it.
+"""
+import numpy as np
+
+WINDOW = 50 # Steps of history the monitor looks at
+TOLERANCE = 1e-4 # Largest change over the window, in any concentration, health or activation rate, that still counts as steady
+SAMPLE_EVERY = 10 # While steady, one step in this many is really run to check the body is still steady
+
+class SteadyStateMonitor:
+    """
+    Runs a body step by step (as Body.run does) while recording its concentrations and every organ's health and activation rate. Once none of them has changed by more than tolerance over the last window steps the body is taken to be in steady state.
+    In steady state the body is advanced in closed form: concentrations and organ parameters stay where they are, and chemical quantities carry on changing at their average rate over the window. One step in every sample_every is still really run, and if it moves anything by more than tolerance the body wakes up and is stepped in full again.
+    The body also wakes up if its chemicals are changed from outside between runs (add_chemical or rem_chemical). For anything else that disturbs it, call wake
+    """
+    def __init__(self, body, window=WINDOW, tolerance=TOLERANCE, sample_every=SAMPLE_EVERY, rng=None):
+        if rng is None:
+            rng = np.random.default_rng()
+        self._rng = rng
+        self._body = body
+        self._window = window
+        self._tolerance = tolerance
+        self._sample_every = max(sample_every, 1)
+        size = len(body.get_concentrations()) + 2 * len(body.get_organs())
+        # Ring buffers of the last window states and chemical quantities
+        self._states = np.zeros((window, size))
+        self._quantities = np.zeros((window, len(body.get_chemicals())))
+        self._recorded = 0
+        self._steady = False
+        self._drift = None
+        self._writes = body.get_chemical_writes()
+        self._skipped = 0
+
+    def get_state(self):
+        body = self._body
+        organs = body.get_organs()
+        return np.concatenate((body.get_concentrations(), [organ.get_health() for organ in organs], [organ.get_act_rate() for organ in organs]))
+
+    def step(self):
+        """
+        Really runs one step of the body
+        """
+        self._body.run(1, self._rng)
+        self._writes = self._body.get_chemical_writes()
+
+    def record(self):
+        slot = self._recorded % self._window
+        self._states[slot] = self.get_state()
+        self._quantities[slot] = self._body.get_chemicals()
+        self._recorded += 1
+        if self._recorded >= self._window and np.ptp(self._states, axis=0).max() <= self._tolerance:
+            self._steady = True
+            oldest = self._quantities[self._recorded % self._window]
+            newest = self._quantities[(self._recorded - 1) % self._window]
+            self._drift = (newest - oldest) / (self._window - 1)
+
+    def wake(self):
+        """
+        Goes back to stepping the body in full, and forgets the window so steady state has to be found again
+        """
+        self._steady = False
+        self._drift = None
+        self._recorded = 0
+
+    def fast_forward(self, steps):
+        """
+        Advances the body steps steps in closed form
+        """
+        chems = self._body.get_chemicals()
+        chems += steps * self._drift
+        np.maximum(chems, 0, out=chems)
+        self._body.calc_concentrations()
+        self._skipped += steps
+
+    def run(self, steps):
+        """
+        Advances the body by steps steps, fast-forwarding through the ones in steady state
+        """
+        if self._body.get_chemical_writes() != self._writes:
+            self.wake()
+        done = 0
+        while done < steps:
+            if not self._steady:
+                self.step()
+                self.record()
+                done += 1
+                continue
+            # Skip ahead to the next sampled step, then really run it
+            skip = min(self._sample_every - 1, steps - done)
+            if skip:
+                self.fast_forward(skip)
+                done += skip
+            if done == steps:
+                break
+            before = self.get_state()
+            self.step()
+            done += 1
+            if np.abs(self.get_state() - before).max() > self._tolerance:
+                self.wake()
+                self.record()
+
+    def is_steady(self):
+        return self._steady
+
+    def get_drift(self):
+        """
+        Returns how much each chemical's quantity changes per step in steady state (None when not steady)
+        """
+        return self._drift
+
+    def get_skipped(self):
+        """
+        Returns how many steps have been fast-forwarded rather than run
+        """
+        return self._skipped
@@ -1,6 +1,8 @@
 import string
 import random
 import math
+import numpy as np
+from Genome import PackedGenome
 
 """
 Constants for health decay function
@@ -27,10 +29,10 @@ def generate_id(length=10):
 
 
 def generate_genome(length=400):
-    bits = b''
-    for i in range(length):
-        bits += random.choice([b'0',b'1'])
-    return bits
+    """
+    Generate a random genome of length bits, packed 8 bits to a byte. Use .to_bytes() for the old b'0101' form.
+    """
+    return PackedGenome(length, random.getrandbits(length))
 
 def analyze_organism(organism):
     data = {"Organ Count":0, "Gene Count":0, "Organs": dict(), "Average Genes per Organ": 0} 
@@ -139,34 +141,344 @@ def reverse_square(base, coefficient):
         return (base ** (coefficient * x * -1)) ** .5
     return rev
 
+def smoothstep(x):
+    if x <= 0.0: return 0.0
+    if x >= 1.0: return 1.0
+    return 3 * x * x - 2 * x * x * x
+
 def health_decay(health, param):
     """
     Essentially functions like a halflife for organ health
     Forms an equation with 3 plateaus, one at param=0, one at param=health, and one at param=1
     equation parameters primarily control steepness of slopes and they y value of the 0 and 1 slopes. V controls  the position of center slope Ideal is around .04, but causes issues where f(health=param) < health., stability causes decay
     """
+    # plateau maps (fit to examples)
+    b = health
+    root = b**.5
+    L = max(0.0, COEF_ONE * root * P_ONE + Q_ONE * b)
+    M = min(1.0, COEF_TWO * root * P_TWO + Q_TWO * b)
+    a = param + V
+    if not a <= b and not b < a <= 1-V:
+        # Past the top plateau, where this used to call itself again with param at 1-V
+        a = 1-V + V
+    if a <= b:
+        t = 0.0 if b <= 0.0 else smoothstep(a / b) ** R
+        return L * (1 - t) + b * t
+    t = 0.0 if b >= 1.0 else smoothstep((a - b) / (1 - b)) ** R
+    return b * (1 - t) + M * t
 
-    def smoothstep(x):
-        if x <= 0.0: return 0.0
-        if x >= 1.0: return 1.0
-        return 3 * x * x - 2 * x * x * x
-
-    def terrace(a, b, q=2.0):
-        # plateau maps (fit to examples)
-        param_p_one = COEF_ONE * b**.5 * P_ONE
-        param_p_two = COEF_TWO * b**.5 * P_TWO
-        L = max(0.0, param_p_one + Q_ONE * b)
-        M = min(1.0, param_p_two + Q_TWO * b)
-        a = a + V
-        if a <= b:
-            t = 0.0 if b <= 0.0 else smoothstep(a / b) ** R
-            return L * (1 - t) + b * t
-        elif b < a <= 1-V:
-            t = 0.0 if b >= 1.0 else smoothstep((a - b) / (1 - b)) ** R
-            return b * (1 - t) + M * t
-        else:
-            return terrace(1-V,b)
-
-    return terrace(param, health)
+def smoothstep_array(x):
+    x = np.clip(x, 0.0, 1.0)
+    return 3 * x * x - 2 * x * x * x
+
+def health_decay_array(health, param):
+    """
+    health_decay for arrays of healths and params (anything that broadcasts), so many organs can be updated at once. Agrees with health_decay to within rounding
+    """
+    b = np.asarray(health, dtype=float)
+    a = np.asarray(param, dtype=float) + V
+    root = np.sqrt(b)
+    L = np.maximum(0.0, COEF_ONE * root * P_ONE + Q_ONE * b)
+    M = np.minimum(1.0, COEF_TWO * root * P_TWO + Q_TWO * b)
+    a = np.where(~(a <= b) & ~((b < a) & (a <= 1-V)), 1-V + V, a)
+    low = a <= b
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_low = np.where(b <= 0.0, 0.0, smoothstep_array(a / b) ** R)
+        t_high = np.where(b >= 1.0, 0.0, smoothstep_array((a - b) / (1 - b)) ** R)
+    return np.where(low, L * (1 - t_low) + b * t_low, b * (1 - t_high) + M * t_high)
 
 functions  = [linear, inverse_linear, exponential, inverse_exponential, radical, inverse_radical, sigmoid, reverse_sigmoid, reverse_square]
+
+"""
+Array versions of the activation functions. Each takes an array of inputs and the function's params as arrays (or single values) that broadcast against it, so one call evaluates many genes that share a function but not params. The arithmetic is done in the same order as the scalar versions
+"""
+MAX_PARAMS = 2
+
+def linear_array(x):
+    return np.array(x, dtype=float)
+
+def inverse_linear_array(x):
+    return 1 - np.asarray(x, dtype=float)
+
+def exponential_array(x, exponent):
+    return np.power(np.asarray(x, dtype=float), exponent)
+
+def inverse_exponential_array(x, exponent):
+    return 1 - exponential_array(x, exponent)
+
+def radical_array(x, radicand):
+    """
+    Where the radicand is 0 (the scalar version raises ZeroDivisionError) gives nan
+    """
+    radicand = np.asarray(radicand, dtype=float)
+    with np.errstate(divide='ignore'):
+        exponent = 1 / radicand
+    return np.where(radicand == 0, np.nan, np.power(np.asarray(x, dtype=float), np.where(radicand == 0, 1, exponent)))
+
+def inverse_radical_array(x, radicand):
+    return 1 - radical_array(x, radicand)
+
+def sigmoid_array(x, coefficient, mean):
+    x = np.asarray(x, dtype=float)
+    return 1 / (1 + np.power(math.e, (coefficient * x * -1) + (np.divide(mean, 128) * coefficient)))
+
+def reverse_sigmoid_array(x, coefficient, mean):
+    return (-1*sigmoid_array(x, coefficient, mean) + 1)
+
+def reverse_square_array(x, base, coefficient):
+    base = 1 + np.divide(base, 16)
+    coefficient = np.add(coefficient, 1)
+    return np.power(np.power(base, coefficient * np.asarray(x, dtype=float) * -1), .5)
+
+array_functions = [linear_array, inverse_linear_array, exponential_array, inverse_exponential_array, radical_array, inverse_radical_array, sigmoid_array, reverse_sigmoid_array, reverse_square_array]
+
+def evaluate_activations(funcs, params, x):
+    """
+    Evaluates each x[i] with function index funcs[i] and params params[i] (a row of MAX_PARAMS, padded with anything past what the function takes). Genes are grouped by function, so there is one array call per function used however many different params there are
+    """
+    funcs = np.asarray(funcs)
+    params = np.asarray(params, dtype=float).reshape(len(funcs), MAX_PARAMS)
+    x = np.asarray(x, dtype=float)
+    out = np.empty(len(x))
+    for func in np.unique(funcs).tolist():
+        picked = funcs == func
+        out[picked] = array_functions[func](x[picked], *params[picked, :len(bits_needed[func])].T)
+    return out
+
+TABLE_SIZE = 1025 # Points in an activation function's lookup table, evenly spaced over 0 to 1 inclusive
+TABLE_MAX_ERROR = 1e-3 # Largest difference from the exact function a lookup table may have for it to be used in table mode
+TABLE_ERROR_SAMPLES = 8 # Points checked between each pair of table points when measuring a table's error
+
+def table_function(function, table):
+    """
+    Returns a function that linearly interpolates table (an array of values of function at evenly spaced points from 0 to 1 inclusive), and calls function itself for anything outside 0 to 1. Like the activation functions it takes a single value or a NumPy array
+    """
+    values = table
+    steps = np.diff(values)
+    table = table.tolist()
+    last = len(table) - 2
+    scale = len(table) - 1
+    def lookup(x):
+        if type(x) is np.ndarray:
+            # The points are evenly spaced, so which step each x falls in is worked out directly rather than searched for
+            inside = (x >= 0) & (x <= 1)
+            position = np.where(inside, x, 0) * scale
+            i = np.minimum(position.astype(np.int64), last)
+            out = values[i] + (position - i) * steps[i]
+            if not inside.all():
+                out[~inside] = function(x[~inside])
+            return out
+        if 0 <= x <= 1:
+            position = x * scale
+            i = min(int(position), last)
+            low = table[i]
+            return low + (position - i) * (table[i + 1] - low)
+        return function(x)
+    return lookup
+
+class ActivationFunction:
+    """
+    An activation function together with its parameters, called just like the function itself.
+    Get these from get_activation rather than making them directly: it interns them by (function index, params), so every gene with the same function and params, across every organism, shares one. That makes comparing and hashing them an identity check.
+    """
+    __slots__ = ('_func', '_params', '_function', '_tables', '_errors', '_evaluate')
+
+    def __init__(self, func, params=()):
+        self._func = func
+        self._params = tuple(params)
+        self._function = functions[func](*self._params)
+        self._tables = {}
+        self._errors = {}
+        self._evaluate = self._function
+
+    def __call__(self, x):
+        return self._evaluate(x)
+
+    def get_func(self):
+        return self._func
+
+    def get_name(self):
+        return func_names[self._func]
+
+    def get_params(self):
+        return self._params
+
+    def get_key(self):
+        return (self._func, self._params)
+
+    def get_function(self):
+        """
+        Returns the plain function calls go to (the lookup table's one in table mode), for callers that want to skip the extra call
+        """
+        return self._evaluate
+
+    def get_exact_function(self):
+        return self._function
+
+    def get_table(self, size=TABLE_SIZE):
+        """
+        Returns the function's values at size evenly spaced points from 0 to 1 inclusive, worked out the first time each size is asked for and kept
+        """
+        table = self._tables.get(size)
+        if table is None:
+            table = np.array([self._function(x) for x in np.linspace(0, 1, size).tolist()], dtype=float)
+            table.flags.writeable = False
+            self._tables[size] = table
+        return table
+
+    def evaluate(self, x):
+        """
+        Evaluates the function over an array of inputs (with the lookup table in table mode)
+        """
+        if self.is_tabled():
+            return self._evaluate(np.asarray(x, dtype=float))
+        return array_functions[self._func](x, *self._params)
+
+    def get_table_error(self, size=TABLE_SIZE):
+        """
+        Returns the largest difference between the function and its linearly interpolated table over 0 to 1, checked at TABLE_ERROR_SAMPLES points per table step. It is infinite for a function that can't be evaluated there (a radical with radicand 0)
+        """
+        error = self._errors.get(size)
+        if error is None:
+            try:
+                table = self.get_table(size)
+                points = np.linspace(0, 1, (size - 1) * TABLE_ERROR_SAMPLES + 1)
+                exact = np.array([self._function(x) for x in points.tolist()], dtype=float)
+                error = float(np.max(np.abs(np.interp(points, np.linspace(0, 1, size), table) - exact)))
+            except (ZeroDivisionError, OverflowError):
+                error = math.inf
+            self._errors[size] = error
+        return error
+
+    def use_table(self, enabled=True, size=TABLE_SIZE, max_error=TABLE_MAX_ERROR):
+        """
+        Switches calls between the exact function and its lookup table. The table is only used if its error (get_table_error) is at most max_error, and returns whether it is
+        """
+        if enabled and self.get_table_error(size) <= max_error:
+            self._evaluate = table_function(self._function, self.get_table(size))
+            return True
+        self._evaluate = self._function
+        return False
+
+    def is_tabled(self):
+        return self._evaluate is not self._function
+
+    def __reduce__(self):
+        # Closures can't be pickled, so rebuild (and intern) from the key instead
+        return (get_activation, self.get_key())
+
+    def __repr__(self):
+        return f"ActivationFunction({self.get_name()!r}, {self._params})"
+
+class ActivationSet:
+    """
+    Numbers a set of ActivationFunctions, in the order they're added, so many genes' outputs can be worked out at once from arrays of function numbers and inputs.
+    Whether each function is tabled (see set_table_mode) is taken as of when it's added, for batches of every size: later switches of the mode don't reach a set that already exists
+    """
+    SCALAR_SIZE = 16 # Fewer inputs than this are quicker one at a time than through NumPy
+
+    def __init__(self):
+        self._functions = []
+        self._plain = []
+        self._table_flags = np.zeros(0, dtype=bool)
+        self._ids = {}
+        self._funcs = np.zeros(0, dtype=np.int64)
+        self._params = np.zeros((0, MAX_PARAMS))
+        self._tabled = False
+
+    def add(self, function):
+        """
+        Returns the number of function, adding it if it's new
+        """
+        function_id = self._ids.get(function)
+        if function_id is None:
+            function_id = len(self._functions)
+            self._ids[function] = function_id
+            self._functions.append(function)
+            self._plain.append(function.get_function())
+            self._table_flags = np.append(self._table_flags, function.is_tabled())
+            self._tabled |= function.is_tabled()
+            self._funcs = np.append(self._funcs, function.get_func())
+            params = np.zeros((1, MAX_PARAMS))
+            params[0, :len(function.get_params())] = function.get_params()
+            self._params = np.append(self._params, params, axis=0)
+        return function_id
+
+    def __len__(self):
+        return len(self._functions)
+
+    def get_functions(self):
+        return self._functions
+
+    def evaluate(self, function_ids, x):
+        """
+        Evaluates each x[i] with function number function_ids[i]. Functions that were tabled when added (see set_table_mode) are evaluated with those tables, the rest grouped by function index with evaluate_activations
+        """
+        if len(x) == 0:
+            return np.empty(0)
+        if len(x) < self.SCALAR_SIZE:
+            plain = self._plain
+            return np.array([plain[f](v) for f, v in zip(function_ids.tolist(), x.tolist())], dtype=float)
+        if not self._tabled:
+            return evaluate_activations(self._funcs[function_ids], self._params[function_ids], x)
+        out = np.empty(len(x))
+        tabled = self._table_flags[function_ids]
+        exact = ~tabled
+        if exact.any():
+            out[exact] = evaluate_activations(self._funcs[function_ids[exact]], self._params[function_ids[exact]], x[exact])
+        for function_id in np.unique(function_ids[tabled]).tolist():
+            picked = function_ids == function_id
+            # The same lookup function as single values go to
+            out[picked] = self._plain[function_id](x[picked])
+        return out
+
+class FunctionRegistry:
+    """
+    Interns ActivationFunctions by (function index, params). There are at most a few tens of thousands of combinations, so entries are never evicted
+    """
+    def __init__(self):
+        self._functions = {}
+        self._table_mode = False
+
+    def get(self, func, params=()):
+        key = (func, tuple(params))
+        function = self._functions.get(key)
+        if function is None:
+            function = ActivationFunction(func, key[1])
+            if self._table_mode:
+                function.use_table()
+            self._functions[key] = function
+        return function
+
+    def set_table_mode(self, enabled=True):
+        """
+        Switches every function, now and from then on, to its lookup table (see ActivationFunction.use_table) or back to the exact function. Off by default
+        """
+        self._table_mode = enabled
+        for function in self._functions.values():
+            function.use_table(enabled)
+
+    def get_table_mode(self):
+        return self._table_mode
+
+    def get_count(self):
+        return len(self._functions)
+
+    def clear(self):
+        self._functions.clear()
+
+# The registry decoders use, shared by everything in this process
+REGISTRY = FunctionRegistry()
+
+def get_activation(func, params=()):
+    """
+    Returns the shared ActivationFunction for function index func with params
+    """
+    return REGISTRY.get(func, params)
+
+def set_table_mode(enabled=True):
+    """
+    Opt in (or back out) to activation functions backed by lookup tables. Over 0 to 1 they are linearly interpolated from TABLE_SIZE points, and are within TABLE_MAX_ERROR of the exact function; a function whose table can't manage that (radicals are steep near 0), and any input outside 0 to 1, still goes to the exact function.
+    Functions are shared, so this applies to every gene in every organism at once. Compiled simulators (Simulator, Network) pick up the mode when they are built
+    """
+    REGISTRY.set_table_mode(enabled)
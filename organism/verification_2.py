@@ -1,5 +1,9 @@
 import unittest
 import copy
+import math
+import os
+import tempfile
+import pickle
 import random
 import numpy as np
 import pandas as pd
@@ -7,7 +11,22 @@ import seaborn as sb
 import matplotlib.pyplot as plt
 from utilities import *
 import Constructor
+import Chemicals
+from BioChemGene import REACTION_MAX, Receptor, Emitter, Reaction
 from Constructor import Decoder, DecoderLinkedList
+from Genome import Node, PackedGenome
+from Body import Body
+from DecodeModel import DecodeModel
+from GenomeIndex import GenomeIndex
+from Simulator import PopulationSimulator
+from Network import compile_body
+from Scheduler import ActivationScheduler
+from Organ import InternalOrgan, HEALTH, ACT_RATE
+from Reactions import ReactionTable
+from SteadyState import SteadyStateMonitor, WINDOW, SAMPLE_EVERY
+from Snapshot import save_bodies, save_simulator, load_snapshot
+from Reproduction import MutationEngine, UNIFORM, PARAMS, WEIGHTED, bit_flip_in_params, bit_flip_weighted, random_bit_flip_string, sample_sites, flip_segment
+import Reproduction
 
 ORGAN_START = b'11001000'
 O_PARAM_ONE = b'00001'
@@ -26,6 +45,7 @@ GENE_THREE_CHEMS =b'010000011000100001001000000010' # 16, 6, 8, 4, 32, 2
 TEST_GENOME = ORGAN_START + O_PARAM_ONE + O_PARAM_TWO + GENE_START + GENE_TYPE + GENE_RATE + GENE_FUNC +GENE_PARAMS + GENE_START + GENE_TWO + GENE_TWO_FUNC + GENE_TWO_PARAMS + GENE_START + GENE_THREE + GENE_THREE_PARAMS + GENE_THREE_CHEMS + ORGAN_START + b'10101101010101010101010101010101011010101010101010101010101010101010101010101010101010'
 
 SEED = None
+ATTEMPTS = 200 # Random genomes (or bodies) a test looking for a particular kind tries before giving up
 
 class FirstTest(unittest.TestCase):
     """
@@ -408,25 +428,1034 @@ class ThirdTest(unittest.TestCase):
         plt.tight_layout()
         plt.show()
         
+class PackedGenomeTest(unittest.TestCase):
+    """
+    Test that the packed genome converts losslessly and decodes the same as the byte string form
+    """
+    @classmethod
+    def setUpClass(cls):
+        random.seed(SEED)
+        cls._decoder = DecoderLinkedList()
+
+    def test1(self):
+        """
+        Converting to and from the byte string form should not add or lose bits
+        """
+        packed = PackedGenome.from_bytes(TEST_GENOME)
+        self.assertEqual(len(packed), len(TEST_GENOME))
+        self.assertEqual(packed.to_bytes(), TEST_GENOME)
+        self.assertEqual(packed.to_bytes(8, 18), TEST_GENOME[8:18])
+        genome = generate_genome(1203)
+        self.assertEqual(PackedGenome.from_bytes(genome.to_bytes()), genome)
+
+    def test2(self):
+        """
+        Reading from the packed genome should match parsing the byte string
+        """
+        genome = generate_genome(4800)
+        strand = genome.to_bytes()
+        for pos in range(0, 4790, 7):
+            self.assertEqual(genome.read(pos, 8), int(strand[pos:pos+8], 2))
+
+    def test3(self):
+        """
+        Both forms of a genome should decode into the same organism
+        """
+        genome = generate_genome(4800)
+        self._decoder.set_genome(genome)
+        packed_creature = self._decoder.read_genome()
+        self._decoder.set_genome(genome.to_bytes())
+        byte_creature = self._decoder.read_genome()
+        self.assertEqual(analyze_organism(packed_creature)["Gene Count"], analyze_organism(byte_creature)["Gene Count"])
+        self.assertEqual([len(o.get_genes()) for o in packed_creature.get_organs()], [len(o.get_genes()) for o in byte_creature.get_organs()])
+
+class OpcodeScanTest(unittest.TestCase):
+    """
+    Test that the vectorized opcode scan finds the same frames as reading them one at a time
+    """
+    def test1(self):
+        """
+        Every organ and gene opcode in a random genome should be found in the matching reading frame
+        """
+        genome = generate_genome(2400)
+        strand = genome.to_bytes()
+        organ_frames, opcode_frames = Constructor.scan_opcodes(genome)
+        for pos in range(len(strand) - 7):
+            val = int(strand[pos:pos+8], 2)
+            is_organ = Constructor.ORGAN_LOWER_LIMIT <= val <= Constructor.ORGAN_UPPER_LIMIT
+            is_gene = Constructor.GENE_LOWER_LIMIT <= val <= Constructor.GENE_UPPER_LIMIT
+            self.assertEqual(pos in organ_frames[pos % 8], is_organ)
+            self.assertEqual(pos in opcode_frames[pos % 8], is_organ or is_gene)
+
+class DecodeManyTest(unittest.TestCase):
+    """
+    Test that batch decoding across processes matches decoding one at a time
+    """
+    def test1(self):
+        """
+        Results come back in the same order as the genomes, whether decoded serially or in a pool
+        """
+        genomes = [generate_genome(1200) for _ in range(40)]
+        serial = Constructor.decode_many(genomes)
+        pooled = Constructor.decode_many(iter(genomes), workers=2, chunk_size=7)
+        self.assertEqual(len(pooled), len(genomes))
+        self.assertEqual([d["Gene Count"] for d in serial], [d["Gene Count"] for d in pooled])
+        self.assertEqual([d["Organ Count"] for d in serial], [d["Organ Count"] for d in pooled])
+
+    def test2(self):
+        """
+        Bodies themselves can be returned, from a pool as well
+        """
+        genomes = [generate_genome(1200) for _ in range(6)]
+        serial = Constructor.decode_many(genomes, phenotype=None)
+        pooled = Constructor.decode_many(genomes, workers=2, chunk_size=2, phenotype=None)
+        self.assertEqual(len(pooled), 6)
+        for ours, theirs, genome in zip(serial, pooled, genomes):
+            self.assertEqual(theirs.get_genome(), genome)
+            self.assertEqual(len(theirs.get_organs()), len(ours.get_organs()))
+            self.assertEqual([len(organ.get_genes()) for organ in theirs.get_organs()], [len(organ.get_genes()) for organ in ours.get_organs()])
+
+class DecodeCacheTest(unittest.TestCase):
+    """
+    Test that cached decoding builds the same, but separate, organisms
+    """
+    def test1(self):
+        """
+        A repeated genome should hit the cache and decode into an equal but unshared organism
+        """
+        cache = Constructor.DecodeCache()
+        decoder = DecoderLinkedList(cache)
+        genome = generate_genome(4800)
+        decoder.set_genome(genome)
+        first = decoder.read_genome()
+        decoder.set_genome(genome.copy())
+        second = decoder.read_genome()
+        self.assertEqual(cache.get_misses(), 1)
+        self.assertEqual(cache.get_hits(), 1)
+        self.assertEqual(analyze_organism(first)["Gene Count"], analyze_organism(second)["Gene Count"])
+        self.assertEqual(len(first.get_organs()), len(second.get_organs()))
+        for organ_a, organ_b in zip(first.get_organs(), second.get_organs()):
+            self.assertIsNot(organ_a, organ_b)
+            self.assertEqual(organ_a.get_act_rate(), organ_b.get_act_rate())
+
+    def test2(self):
+        """
+        The cache should never hold more entries or bytes than it was given
+        """
+        cache = Constructor.DecodeCache(max_entries=3)
+        decoder = DecoderLinkedList(cache)
+        for _ in range(5):
+            decoder.set_genome(generate_genome(1200))
+            decoder.read_genome()
+        self.assertEqual(cache.get_entry_count(), 3)
+        small = Constructor.DecodeCache(max_bytes=cache.get_bytes() // 3)
+        decoder.set_cache(small)
+        for _ in range(5):
+            decoder.set_genome(generate_genome(1200))
+            decoder.read_genome()
+        self.assertLessEqual(small.get_bytes(), cache.get_bytes() // 3)
+
+class IncrementalDecodeTest(unittest.TestCase):
+    """
+    Test that re-reading only around mutations gives the same result as reading the whole genome
+    """
+    def test1(self):
+        """
+        Templates from incremental reads should match full reads for any number of flips
+        """
+        decoder = DecoderLinkedList()
+        parent = generate_genome(4800)
+        decoder.set_genome(parent)
+        decoder.read_genome()
+        parent_template = decoder.get_template()
+        for flips in (1, 3, 40):
+            for _ in range(20):
+                child = parent.copy()
+                for _ in range(flips):
+                    child.flip(random.randrange(len(child)))
+                decoder.set_genome(child)
+                full = decoder.read_structures()
+                decoder.set_genome(child)
+                self.assertEqual(full, decoder.reread_structures(parent_template, parent.diff_positions(child)))
+
+    def test2(self):
+        """
+        Decoding from the parent should build the same organism as decoding from scratch
+        """
+        decoder = DecoderLinkedList()
+        parent = generate_genome(4800)
+        decoder.set_genome(parent)
+        decoder.read_genome()
+        parent_template = decoder.get_template()
+        child = parent.copy()
+        child.flip(2400)
+        decoder.set_genome(child)
+        creature = decoder.read_genome_from_parent(parent, parent_template)
+        decoder.set_genome(child)
+        fresh = decoder.read_genome()
+        self.assertEqual(analyze_organism(creature)["Gene Count"], analyze_organism(fresh)["Gene Count"])
+        self.assertEqual([o.get_act_rate() for o in creature.get_organs()], [o.get_act_rate() for o in fresh.get_organs()])
+
+class SummaryTest(unittest.TestCase):
+    """
+    Test that the summary mode counts the same as decoding and analyzing the organism
+    """
+    def test1(self):
+        genomes = [generate_genome(4800) for _ in range(50)]
+        rows = Constructor.summarize_genomes(genomes)
+        for genome, row in zip(genomes, rows):
+            decoder = DecoderLinkedList()
+            decoder.set_genome(genome)
+            data = analyze_organism(decoder.read_genome())
+            self.assertEqual(data["Organ Count"], row['organ_count'])
+            self.assertEqual(data["Gene Count"], row['gene_count'])
+            organs = list(data["Organs"].values())
+            self.assertEqual([o['Number of genes'] for o in organs], list(row['genes'][:row['organ_count']]))
+            self.assertEqual([o['Emitter Count'] for o in organs], list(row['emitters'][:row['organ_count']]))
+            self.assertEqual([o['Receptor Count'] for o in organs], list(row['receptors'][:row['organ_count']]))
+
+class NodeTest(unittest.TestCase):
+    """
+    Test that nodes keep each segment separately and rebuild the genome they were read from
+    """
+    def test1(self):
+        node = Node()
+        node.set_start(b'00110')
+        node.set_params(PackedGenome.from_bytes(b'0001'))
+        node.set_noncoding_bits(1, 3)
+        self.assertEqual(node.get_start(), b'00110')
+        self.assertEqual(node.get_params(), b'0001')
+        self.assertEqual(node.get_noncoding(), b'001')
+        self.assertEqual(node.get_params_bits(), (1, 4))
+        self.assertEqual(node.get_length(), 12)
+        self.assertEqual(node.get_structure_genome(), b'001100001001')
+        node.next = node.copy()
+        node.next.set_noncoding(None)
+        self.assertEqual(node.get_entire_genome(), b'001100001001001100001')
+        self.assertEqual(Node().get_start(), b'')
+
+    def test2(self):
+        """
+        Nodes from decoding hold the whole genome, including the tail after reading stopped
+        """
+        for _ in range(20):
+            genome = generate_genome(4800)
+            decoder = DecoderLinkedList()
+            decoder.set_genome(genome)
+            organism = decoder.read_genome()
+            if not organism.get_organs():
+                continue
+            self.assertEqual(organism.get_genome(), genome)
+            self.assertEqual(organism.get_dna_head().get_entire_genome(), genome)
+
+class GenomeIndexTest(unittest.TestCase):
+    """
+    Test that the array index of a genome agrees with the linked list, and that rearranging it moves whole structures
+    """
+    def setUp(self):
+        self._genome = generate_genome(4800)
+        decoder = DecoderLinkedList()
+        decoder.set_genome(self._genome)
+        self._organism = decoder.read_genome()
+        self._index = GenomeIndex.from_template(self._genome, decoder.get_template())
+
+    def test1(self):
+        self.assertEqual(self._index.get_genome(), self._genome)
+        self.assertEqual(self._index.to_nodes().get_entire_genome(), self._genome)
+        if not self._organism.get_organs():
+            return
+        from_nodes = GenomeIndex.from_nodes(self._organism._dna_head)
+        self.assertEqual(list(from_nodes.get_kinds()), list(self._index.get_kinds()))
+        self.assertEqual(list(from_nodes.get_starts()), list(self._index.get_starts()))
+        for i in range(len(self._index)):
+            self.assertEqual(from_nodes.get_params_bits(i), self._index.get_params_bits(i))
+            self.assertEqual(from_nodes.get_start_bits(i), self._index.get_start_bits(i))
+
+    def test2(self):
+        index = self._index
+        if len(index) < 4:
+            return
+        duplicated = index.duplicate([1, 3])
+        self.assertEqual([duplicated.get_structure(i)[0] for i in range(len(duplicated))], list(np.insert(index.get_kinds(), [2, 4], index.get_kinds()[[1, 3]])))
+        self.assertEqual(duplicated.get_params_bits(2), index.get_params_bits(1))
+        self.assertEqual(len(duplicated.get_genome()), len(index.get_genome()) + index.get_lengths()[1] + index.get_lengths()[3])
+        deleted = index.delete([2])
+        self.assertEqual(len(deleted), len(index) - 1)
+        self.assertEqual(deleted.get_noncoding_bits(2), index.get_noncoding_bits(3))
+        moved = index.transpose([1], [3])
+        self.assertEqual(moved.get_start_bits(4), index.get_start_bits(1))
+        self.assertEqual(moved.get_genome().to_bytes(moved.get_starts()[4], moved.get_starts()[5]), index.get_genome().to_bytes(index.get_starts()[1], index.get_starts()[2]))
+        self.assertRaises(ValueError, index.rearrange, [1, 0])
+
+class MutationEngineTest(unittest.TestCase):
+    """
+    Test that point mutations are applied in place, in one pass, and only inside the regions of their strategy
+    """
+    def setUp(self):
+        self._genome = generate_genome(4800)
+        decoder = DecoderLinkedList()
+        decoder.set_genome(self._genome)
+        self._organism = decoder.read_genome()
+        self._engine = MutationEngine.from_organism(self._organism, .05)
+
+    def test1(self):
+        """
+        flip_many should match flipping one bit at a time, with repeated positions flipping back
+        """
+        genome = self._organism.get_genome().copy()
+        positions = [random.randrange(len(genome)) for _ in range(100)] + [7, 7, len(genome) - 1]
+        one_by_one = genome.copy()
+        for pos in positions:
+            one_by_one.flip(pos)
+        genome.flip_many(positions)
+        self.assertEqual(genome, one_by_one)
+        genome.flip_many([])
+        self.assertEqual(genome, one_by_one)
+
+    def test2(self):
+        """
+        An offspring should differ from its parent at exactly the sites drawn, and the parent shouldn't change
+        """
+        parent = self._organism.get_genome()
+        for strategy in (UNIFORM, PARAMS, WEIGHTED):
+            sites = self._engine.get_sites(strategy)
+            child = self._engine.apply(sites)
+            self.assertEqual(child.diff_positions(parent), list(sites))
+            self.assertEqual(self._organism.get_genome(), parent)
+        self.assertRaises(ValueError, self._engine.get_sites, 'structural')
+
+    def test3(self):
+        """
+        Parameter mutations should stay inside parameters, and the weighted regions should cover the genome once
+        """
+        index = self._engine.get_index()
+        inside = np.zeros(len(index.get_genome()), dtype=bool)
+        for start, end in index.get_params_spans():
+            inside[start:end] = True
+        for _ in range(20):
+            self.assertTrue(inside[self._engine.get_sites(PARAMS)].all())
+            child = bit_flip_in_params(self._organism, .05)
+            self.assertTrue(inside[child.diff_positions(self._organism.get_genome())].all())
+        covered = np.sort(np.concatenate([positions for positions, _ in self._engine.get_regions(WEIGHTED)]))
+        self.assertEqual(covered.tolist(), list(range(len(index.get_genome()))))
+
+    def check_sites(self, length, rate, trials=20000):
+        """
+        Checks sample_sites against rolling each bit: the number of flips should follow the binomial distribution and every position should be equally likely. Both are chi-squared tests, failing only far out in the tail
+        """
+        rng = np.random.default_rng(SEED)
+        counts = np.zeros(length + 1)
+        hits = np.zeros(length)
+        for _ in range(trials):
+            sites = sample_sites(length, rate, rng)
+            self.assertTrue((np.diff(sites) > 0).all())
+            counts[len(sites)] += 1
+            hits[sites] += 1
+        expected = trials * np.array([math.comb(length, k) * rate**k * (1 - rate)**(length - k) for k in range(length + 1)])
+        # Pool the unlikely counts so every bin expects at least 5
+        kept = expected >= 5
+        observed = np.append(counts[kept], counts[~kept].sum())
+        expected = np.append(expected[kept], expected[~kept].sum())
+        chi_squared = ((observed - expected)**2 / np.maximum(expected, 1e-12)).sum()
+        free = len(observed) - 1
+        self.assertLess(chi_squared, free + 6 * math.sqrt(2 * free))
+        chi_squared = ((hits - hits.mean())**2 / hits.mean()).sum()
+        self.assertLess(chi_squared, length - 1 + 6 * math.sqrt(2 * (length - 1)))
+
+    def test4(self):
+        """
+        Binomial site sampling should have the same distribution as a roll per bit, for sparse and dense flips
+        """
+        self.check_sites(200, .01)
+        self.check_sites(40, .1)
+        self.check_sites(16, .5)
+        self.assertEqual(len(sample_sites(50, 0)), 0)
+        self.assertEqual(list(sample_sites(50, 1)), list(range(50)))
+
+    def test5(self):
+        """
+        Each region should flip at its own rate under the weighted strategy, as should flip_segment
+        """
+        engine = MutationEngine.from_organism(self._organism, .2, np.random.default_rng(SEED))
+        regions = engine.get_regions(WEIGHTED)
+        flipped = np.zeros(len(engine.get_index().get_genome()))
+        trials = 2000
+        for _ in range(trials):
+            flipped[engine.get_sites(WEIGHTED)] += 1
+        for (positions, rate), divisor in zip(regions, (Reproduction.START_FLIP_DIVISOR, Reproduction.PARAM_FLIP_DIVISOR, Reproduction.NON_CODING_DIVISOR)):
+            self.assertEqual(rate, .2 / divisor)
+            bits = len(positions) * trials
+            if bits:
+                self.assertAlmostEqual(flipped[positions].sum() / bits, rate, delta=6 * math.sqrt(rate * (1 - rate) / bits))
+        segment = b'0' * 32
+        ones = sum(flip_segment(segment, .5, 4).count(b'1') for _ in range(2000))
+        self.assertAlmostEqual(ones / (32 * 2000), .125, delta=6 * math.sqrt(.125 * .875 / (32 * 2000)))
+
+    def test6(self):
+        """
+        Offspring should be as long as the genome their parent was decoded from, over generations and for organisms without organs too
+        """
+        decoder = DecoderLinkedList()
+        for genome in (self._genome, PackedGenome(1200)):
+            for mutate in (random_bit_flip_string, bit_flip_in_params, bit_flip_weighted):
+                child = genome
+                for _ in range(5):
+                    decoder.set_genome(child)
+                    child = mutate(decoder.read_genome(), .05)
+                    self.assertEqual(len(child), len(genome))
+        self.assertRaises(ValueError, MutationEngine.from_organism, Body())
+
+    def test7(self):
+        """
+        Without an rng, random.seed should make offspring reproducible
+        """
+        for mutate in (random_bit_flip_string, bit_flip_in_params, bit_flip_weighted):
+            children = []
+            for _ in range(2):
+                random.seed(11)
+                children.append(mutate(self._organism, .05))
+            self.assertEqual(children[0], children[1])
+        segments = []
+        for _ in range(2):
+            random.seed(11)
+            segments.append([flip_segment(b'0' * 64, .2) for _ in range(5)])
+        self.assertEqual(segments[0], segments[1])
+
+class FunctionRegistryTest(unittest.TestCase):
+    """
+    Test that activation functions are shared between genes and behave like the plain functions
+    """
+    def test1(self):
+        self.assertIs(get_activation(6, (3, 70)), get_activation(6, [3, 70]))
+        self.assertIsNot(get_activation(6, (3, 70)), get_activation(6, (3, 71)))
+        for func, params in [(0, ()), (3, (5,)), (4, (9,)), (7, (100, 12))]:
+            function = get_activation(func, params)
+            plain = functions[func](*params)
+            for x in (0, .25, .5, .9, 1):
+                self.assertEqual(function(x), plain(x))
+            table = function.get_table(5)
+            self.assertEqual(list(table), [plain(x) for x in (0, .25, .5, .75, 1)])
+            self.assertIs(table, function.get_table(5))
+            self.assertIs(pickle.loads(pickle.dumps(function)), function)
+
+    def test2(self):
+        # Genes decoded from two copies of the same genome share every function
+        genome = generate_genome(4800)
+        functions_used = []
+        for _ in range(2):
+            decoder = DecoderLinkedList()
+            decoder.set_genome(genome.copy())
+            organism = decoder.read_genome()
+            functions_used.append([gene.get_activation_function() for organ in organism.get_organs() for gene in organ.get_genes() if gene.get_type() != 'reaction'])
+        self.assertEqual(len(functions_used[0]), len(functions_used[1]))
+        for first, second in zip(*functions_used):
+            self.assertIs(first, second)
+
+class ArrayFunctionTest(unittest.TestCase):
+    """
+    Test that the array versions of the activation functions, alone and grouped, give what the scalar versions give
+    """
+    def test1(self):
+        x = np.concatenate((np.random.random(40), [0, 1]))
+        for func in range(len(functions)):
+            for _ in range(10):
+                params = tuple(random.randint(1, 128) for _ in bits_needed[func])
+                plain = functions[func](*params)
+                np.testing.assert_allclose(array_functions[func](x, *params), [plain(v) for v in x.tolist()], rtol=1e-10, atol=1e-12)
+        self.assertTrue(np.isnan(radical_array(x, 0)).all())
+
+    def test2(self):
+        # A mix of functions and params, evaluated in one grouped pass
+        cases = [(random.randrange(len(functions)), None) for _ in range(300)]
+        cases = [(func, tuple(random.randint(1, 128) for _ in bits_needed[func])) for func, _ in cases]
+        x = np.random.random(len(cases))
+        params = np.zeros((len(cases), MAX_PARAMS))
+        for i, (func, values) in enumerate(cases):
+            params[i, :len(values)] = values
+        expected = [functions[func](*values)(v) for (func, values), v in zip(cases, x.tolist())]
+        np.testing.assert_allclose(evaluate_activations([func for func, _ in cases], params, x), expected, rtol=1e-10, atol=1e-12)
+        activations = ActivationSet()
+        ids = np.array([activations.add(get_activation(func, values)) for func, values in cases])
+        self.assertEqual(len(activations), len(set(cases)))
+        np.testing.assert_allclose(activations.evaluate(ids, x), expected, rtol=1e-10, atol=1e-12)
+        # Only a few values go one at a time through the functions themselves
+        self.assertEqual(list(activations.evaluate(ids[:5], x[:5])), expected[:5])
+
+class HealthDecayTest(unittest.TestCase):
+    """
+    Test that health_decay and health_decay_array match the original recursive health_decay
+    """
+    def test1(self):
+        health = np.concatenate((np.random.random(5000), np.repeat(np.linspace(0, 1, 41), 41), [0, 1, 1]))
+        param = np.concatenate((np.random.uniform(-.5, 1.5, 5000), np.tile(np.linspace(0, 1, 41), 41), [1, 0, 2]))
+        expected = [original_health_decay(h, p) for h, p in zip(health.tolist(), param.tolist())]
+        self.assertEqual([health_decay(h, p) for h, p in zip(health.tolist(), param.tolist())], expected)
+        np.testing.assert_allclose(health_decay_array(health, param), expected, rtol=1e-12, atol=1e-15)
+        self.assertEqual(health_decay_array([[.5], [.25]], [.1, .9]).shape, (2, 2))
+
+class TableModeTest(unittest.TestCase):
+    """
+    Test that activation functions backed by lookup tables stay within TABLE_MAX_ERROR of the exact ones, and that the mode can be switched back off
+    """
+    def tearDown(self):
+        set_table_mode(False)
+
+    def test1(self):
+        cases = [(0, ()), (1, ()), (2, (7,)), (3, (15,)), (4, (0,)), (4, (3,)), (5, (16,)), (6, (128, 60)), (7, (40, 100)), (8, (64, 64))]
+        set_table_mode()
+        x = np.concatenate((np.random.random(500), [0, 1]))
+        for func, params in cases:
+            function = get_activation(func, params)
+            plain = functions[func](*params)
+            if func == 4 and params == (0,):
+                # A radicand of 0 can't be tabled, so it still raises like the plain function
+                self.assertFalse(function.is_tabled())
+                self.assertRaises(ZeroDivisionError, function, .5)
+                continue
+            if not function.is_tabled():
+                self.assertGreater(function.get_table_error(), TABLE_MAX_ERROR)
+                continue
+            values = [function(v) for v in x.tolist()]
+            self.assertLessEqual(max(abs(value - plain(v)) for value, v in zip(values, x.tolist())), TABLE_MAX_ERROR)
+            # Arrays are looked up the same way as single values
+            np.testing.assert_array_equal(function.get_function()(x), values)
+            # Outside 0 to 1 goes to the exact function
+            self.assertEqual(function(1.5), plain(1.5))
+        set_table_mode(False)
+        for func, params in cases:
+            self.assertFalse(get_activation(func, params).is_tabled())
+
+    def test2(self):
+        # Functions made while the mode is on are tabled too
+        registry = FunctionRegistry()
+        registry.set_table_mode()
+        self.assertTrue(registry.get(6, (17, 33)).is_tabled())
+        self.assertFalse(get_activation(6, (17, 33)).is_tabled())
+
+    def test3(self):
+        """
+        An ActivationSet keeps the table state its functions had when added, for small and large batches alike
+        """
+        set_table_mode()
+        activations = ActivationSet()
+        ids = np.array([activations.add(get_activation(6, (128, 60))), activations.add(get_activation(1))])
+        self.assertTrue(activations.get_functions()[0].is_tabled())
+        x = np.random.random(2 * ActivationSet.SCALAR_SIZE)
+        function_ids = ids[np.arange(len(x)) % 2]
+        large = activations.evaluate(function_ids, x)
+        for enabled in (False, True):
+            set_table_mode(enabled)
+            np.testing.assert_array_equal(activations.evaluate(function_ids, x), large)
+            np.testing.assert_array_equal(activations.evaluate(function_ids[:4], x[:4]), large[:4])
+
+class DecodeModelTest(unittest.TestCase):
+    """
+    Test that the analytic model agrees with counting decoded random genomes
+    """
+    def test1(self):
+        random.seed(7)
+        model = DecodeModel(1200)
+        self.assertAlmostEqual(model.organ_distribution().sum(), 1)
+        self.assertAlmostEqual(model.gene_distribution().sum(), 1)
+        rows = Constructor.summarize_genomes([generate_genome(1200) for _ in range(2000)])
+        expected = model.expected_counts()
+        self.assertEqual({type(value) for value in expected.values()}, {float})
+        for key, col in [("Organ Count", 'organ_count'), ("Gene Count", 'gene_count'), ("Receptor Count", 'receptor_count'), ("Emitter Count", 'emitter_count'), ("Reaction Count", 'reaction_count')]:
+            # Well within sampling error: 5 standard errors of the sample mean
+            error = 5 * rows[col].std() / np.sqrt(len(rows))
+            self.assertLess(abs(rows[col].mean() - expected[key]), error, key)
+        self.assertAlmostEqual(model.organs_by_gene_count().sum(), expected["Organ Count"])
+        self.assertAlmostEqual(model.organs_by_gene_count() @ np.arange(len(model.organs_by_gene_count())), expected["Gene Count"])
+
+    def test2(self):
+        """
+        Distributions of each gene type's count should match decoded genomes, and average out to the expected counts
+        """
+        random.seed(7)
+        model = DecodeModel(1200)
+        rows = Constructor.summarize_genomes([generate_genome(1200) for _ in range(2000)])
+        expected = model.expected_counts()
+        for kind, key, col in [('receptor', "Receptor Count", 'receptor_count'), ('emitter', "Emitter Count", 'emitter_count'), ('reaction', "Reaction Count", 'reaction_count')]:
+            distribution = model.gene_type_distribution(kind)
+            self.assertAlmostEqual(distribution.sum(), 1)
+            self.assertAlmostEqual(distribution @ np.arange(len(distribution)), expected[key])
+            for k in range(3):
+                sampled = (rows[col] == k).mean()
+                error = 5 * np.sqrt(distribution[k] * (1 - distribution[k]) / len(rows))
+                self.assertLess(abs(sampled - distribution[k]), error, (kind, k))
+        self.assertRaises(ValueError, model.gene_type_distribution, 'organ')
+
+class BodyChemicalsTest(unittest.TestCase):
+    """
+    Test that chemical quantities and concentrations live in arrays indexed by chemical id
+    """
+    def test1(self):
+        body = Body()
+        body.add_chemical(3, 1.5)
+        body.add_chemical(7, .5)
+        body.rem_chemical(7, 2)
+        body.add_chemical(12, 2.5)
+        body.calc_concentrations()
+        self.assertEqual(body.get_chemical(7), 0)
+        self.assertEqual(list(body.get_chemicals()[[3, 12]]), [1.5, 2.5])
+        self.assertEqual(body.get_concentration(3), 1.5 / 4)
+        self.assertEqual(body.get_concentrations().sum(), 1)
+        self.assertEqual(body.get_concentration(16), 0)
+        # Copies get their own arrays
+        clone = copy.deepcopy(body)
+        clone.add_chemical(3, 1)
+        self.assertEqual(clone.get_chemical(3), 2.5)
+        self.assertEqual(body.get_chemical(3), 1.5)
+
+class BodyRunTest(unittest.TestCase):
+    """
+    Test that Body.run gives the same result as rolling for and activating each organ one at a time, as activate_organs did, with the same rolls
+    """
+    def test1(self):
+        random.seed(SEED)
+        steps = 30
+        for _ in range(ATTEMPTS):
+            body = random_body()
+            other = copy.deepcopy(body)
+            try:
+                seed = random.getrandbits(32)
+                chemicals, health = body.run(steps, np.random.default_rng(seed), trace=True)
+                rolls = np.random.default_rng(seed).random((steps, len(other.get_organs())))
+                for step in range(steps):
+                    # Each organ rolled against its activation rate and activated one at a time, as activate_organs always has
+                    for organ, roll in zip(other.get_organs(), rolls[step].tolist()):
+                        if roll <= organ.get_act_rate():
+                            organ.activate_organ()
+                    other.calc_concentrations()
+                    np.testing.assert_array_equal(chemicals[step], other.get_chemicals())
+                    self.assertEqual(list(health[step]), [organ.get_health() for organ in other.get_organs()])
+            except ZeroDivisionError:
+                continue
+            break
+        else:
+            self.fail("every body tried had an activation function that can't be evaluated")
+        np.testing.assert_array_equal(body.get_chemicals(), other.get_chemicals())
+        self.assertIsNone(other.run(5))
+
+class ReceptorSlotTest(unittest.TestCase):
+    """
+    Test that receptor outputs are averaged into the parameter they adjust
+    """
+    def test1(self):
+        organ = InternalOrgan('internal', Body())
+        organ.set_def_health(.5)
+        organ.set_reaction_rate(.1)
+        organ.set_act_rate(.2)
+        organ.act_rate_adjust(.25)
+        organ.act_rate_adjust(.75)
+        organ.reaction_rate_adjust(.3)
+        self.assertEqual(organ.get_receptor_totals(), [(0, 0), (.3, 1), (1, 2)])
+        organ.update_params()
+        self.assertEqual(organ.get_act_rate(), .5)
+        self.assertEqual(organ.get_reaction_rate(), .3)
+        self.assertEqual(organ.get_health(), health_decay(.5, 0))
+        organ.health_adjust(.9)
+        organ.update_params()
+        # Outputs keep counting towards the average until the receptors are cleared
+        self.assertEqual(organ.get_act_rate(), .5)
+        self.assertEqual(organ.get_health(), health_decay(health_decay(.5, 0), .9))
+        organ.clear_receptors()
+        self.assertEqual(organ.get_receptor_totals(), [(0, 0)] * 3)
+
+    def test2(self):
+        # Decoded genes read and adjust their organ's parameters by slot
+        random.seed(SEED)
+        decoder = DecoderLinkedList()
+        decoder.set_genome(generate_genome(4800))
+        body = decoder.read_genome()
+        body.calc_concentrations()
+        for organ in body.get_organs():
+            self.assertEqual(organ.get_params(), [organ.get_health(), organ.get_reaction_rate(), organ.get_act_rate()])
+            for gene in organ.get_genes():
+                if gene.get_type() == 'reaction':
+                    continue
+                slot = gene.get_slot()
+                self.assertEqual(organ.get_parameter(gene.get_param_name()), organ.get_param(slot))
+                if gene.get_type() == 'emitter':
+                    self.assertEqual(gene.read_param(), organ.get_param(slot))
+                    continue
+                total, count = organ.get_receptor_totals()[slot]
+                try:
+                    gene.adjust_parameter()
+                except ZeroDivisionError:
+                    continue
+                self.assertEqual(organ.get_receptor_totals()[slot], (total + gene.get_output(), count + 1))
+
+class SchedulerTest(unittest.TestCase):
+    """
+    Test that the activation scheduler activates organs as often as rolling for them every tick would
+    """
+    def make_body(self, rates):
+        body = Body()
+        for rate in rates:
+            organ = InternalOrgan('internal', body)
+            organ.set_def_health()
+            organ.set_reaction_rate(0)
+            organ.set_act_rate(rate)
+            body.add_organ(organ)
+        return body
+
+    def test1(self):
+        # An organ without genes drops to an activation rate of 0 once it activates, so each activates at most once, by tick t with probability 1 - (1 - rate)**t
+        rate, ticks, organs = .01, 50, 3000
+        scheduler = ActivationScheduler(self.make_body([rate] * organs))
+        scheduler.run(ticks)
+        expected = 1 - (1 - rate)**ticks
+        spread = (expected * (1 - expected) / organs)**.5
+        self.assertAlmostEqual(np.mean(scheduler.get_activation_counts()), expected, delta=5 * spread)
+        self.assertEqual(scheduler.get_time(), ticks)
+
+    def test2(self):
+        body = self.make_body([0, 1, -.5, 3])
+        scheduler = ActivationScheduler(body)
+        self.assertEqual(scheduler.get_due(), [None, 0, None, 0])
+        scheduler.run(5)
+        self.assertEqual(scheduler.get_activation_counts(), [0, 1, 0, 1])
+        self.assertEqual(scheduler.get_due(), [None] * 4)
+        body.get_organs()[0].set_act_rate(1)
+        scheduler.reschedule(0)
+        self.assertEqual(scheduler.get_due()[0], 5)
+        scheduler.step()
+        self.assertEqual(scheduler.get_activation_counts(), [1, 1, 0, 1])
+
+class ReactionTableTest(unittest.TestCase):
+    """
+    Test that reactions resolved together follow gene order when they compete, and only fire in active organs
+    """
+    def test1(self):
+        consumed = np.zeros((4, Chemicals.NUM_CHEMS))
+        produced = np.zeros((4, Chemicals.NUM_CHEMS))
+        consumed[0, 0], produced[0, 1] = 1, 1
+        # Needs chemical 0 after reaction 0 has taken most of it
+        consumed[1, 0], produced[1, 2] = 1, 2
+        consumed[2, 2], produced[2, 3] = .5, .25
+        # Small enough to fit in what's left of chemical 0, but comes after a reaction it ran short for
+        consumed[3, 0] = .25
+        table = ReactionTable([0, 0, 1, 1], consumed, produced)
+        quantities = np.zeros(Chemicals.NUM_CHEMS)
+        quantities[0], quantities[2] = 1.5, .5
+        self.assertEqual(list(table.feasible(quantities)), [True, True, True, True])
+        self.assertEqual(list(table.resolve(quantities)), [True, False, True, False])
+        self.assertEqual(list(table.resolve(quantities, [False, True])), [False, False, True, True])
+        # Many copies at once
+        copies = np.array([quantities, quantities * 2])
+        self.assertEqual(table.react(copies).tolist(), [[True, False, True, False], [True, True, True, True]])
+        self.assertEqual(list(copies[0, :4]), [.5, 1, 0, .25])
+        self.assertEqual(list(copies[1, :4]), [.75, 1, 2.5, .25])
+
+    def test2(self):
+        random.seed(SEED)
+        body = random_body(accept=lambda body: len(reaction_genes(body)) > 1)
+        reactions = reaction_genes(body)
+        table = body.get_reactions()
+        self.assertEqual(len(table), len(reactions))
+        self.assertIs(table, body.get_reactions())
+        other = copy.deepcopy(body)
+        body.set_batched_reactions()
+        rolls = np.random.random(len(body.get_organs()))
+        try:
+            body.activate_with_rolls(rolls)
+        except ZeroDivisionError:
+            return
+        active = [roll <= organ.get_act_rate() for organ, roll in zip(other.get_organs(), rolls)]
+        for organ, activated in zip(other.get_organs(), active):
+            if activated:
+                organ.activate_organ(react=False)
+        fired = table.react(other.get_chemicals(), active)
+        self.assertFalse(fired[~np.asarray(active)[table.get_organs()]].any())
+        np.testing.assert_array_equal(body.get_chemicals(), other.get_chemicals())
+        self.assertTrue((body.get_chemicals() >= 0).all())
+
+    def test3(self):
+        """
+        A chemical on the left twice only needs to cover each entry, as with check_for_requirements, and both are taken
+        """
+        body = Body()
+        organ = InternalOrgan('internal', body)
+        gene = Reaction(organ, 'reaction')
+        gene.set_num_of_chems_left(1)
+        gene.set_num_of_chems_right(1)
+        gene.set_chems_and_coefficients([(16, 5), (16, 5), (16, 7)]) # 1 of chemical 5, twice, gives 1 of chemical 7
+        organ.add_gene(gene)
+        body.add_organ(organ)
+        body.add_chemical(5, 1.5)
+        table = body.get_reactions()
+        self.assertEqual(table.get_consumed()[0, 5], 2)
+        self.assertEqual(table.get_required()[0, 5], 1)
+        batched = body.get_chemicals().copy()
+        self.assertEqual(list(table.react(batched)), [True])
+        self.assertTrue(gene.check_for_requirements())
+        gene.react()
+        np.testing.assert_array_equal(batched, body.get_chemicals())
+        self.assertEqual(list(batched[[5, 7]]), [0, 1])
+
+    def test4(self):
+        """
+        A repeated reactant that is also produced should end up where Reaction.react leaves it: consumed down to 0 and then released
+        """
+        body = Body()
+        organ = InternalOrgan('internal', body)
+        gene = Reaction(organ, 'reaction')
+        gene.set_num_of_chems_left(1)
+        gene.set_num_of_chems_right(1)
+        gene.set_chems_and_coefficients([(16, 5), (16, 5), (16, 5)]) # 1(5) + 1(5) = 1(5)
+        organ.add_gene(gene)
+        body.add_organ(organ)
+        body.add_chemical(5, 1.5)
+        batched = body.get_chemicals().copy()
+        self.assertEqual(list(body.get_reactions().react(batched)), [True])
+        self.assertTrue(gene.check_for_requirements())
+        gene.react()
+        np.testing.assert_array_equal(batched, body.get_chemicals())
+        self.assertEqual(batched[5], 1)
+
+class SteadyStateTest(unittest.TestCase):
+    """
+    Test that a converged body is fast-forwarded, keeps its chemicals changing at the same rate, and wakes up when its chemicals are changed from outside
+    """
+    def make_body(self):
+        # One organ that activates every step (its only receptor reads a chemical there is none of) and emits 1 unit of chemical 2 each time
+        body = Body()
+        organ = InternalOrgan('internal', body)
+        organ.set_def_health()
+        organ.set_reaction_rate(0)
+        organ.set_act_rate(1)
+        receptor = Receptor(organ, 'receptor')
+        receptor.set_activation('inverse linear', get_activation(1))
+        receptor.set_parameter(ACT_RATE)
+        receptor.set_chemical(5)
+        emitter = Emitter(organ, 'emitter')
+        emitter.set_activation('linear', get_activation(0))
+        emitter.set_parameter(ACT_RATE)
+        emitter.set_chemical(2)
+        emitter.set_output_rate(4)
+        organ.add_gene(receptor)
+        organ.add_gene(emitter)
+        body.add_organ(organ)
+        body.add_chemical(2, 1)
+        body.calc_concentrations()
+        return body
+
+    def test1(self):
+        body = self.make_body()
+        monitor = SteadyStateMonitor(body)
+        # Health takes a few steps to decay to nothing, after which nothing but the quantity of chemical 2 changes
+        monitor.run(WINDOW + 20)
+        self.assertTrue(monitor.is_steady())
+        self.assertEqual(monitor.get_drift()[2], 1)
+        skipped = monitor.get_skipped()
+        steps = SAMPLE_EVERY * 10
+        monitor.run(steps)
+        self.assertEqual(monitor.get_skipped() - skipped, steps - steps // SAMPLE_EVERY)
+        self.assertAlmostEqual(body.get_chemical(2), 1 + WINDOW + 20 + steps)
+        self.assertEqual(body.get_concentration(2), 1)
+        body.add_chemical(3, 5)
+        skipped = monitor.get_skipped()
+        monitor.run(5)
+        self.assertFalse(monitor.is_steady())
+        self.assertEqual(monitor.get_skipped(), skipped)
+
+class SnapshotTest(unittest.TestCase):
+    """
+    Test that running state saved to a snapshot comes back the same, into bodies and into a simulator
+    """
+    def make_bodies(self, count):
+        random.seed(SEED)
+        genomes = []
+        bodies = []
+        for _ in range(ATTEMPTS):
+            if len(bodies) == count:
+                break
+            body = random_body(require_organs=False)
+            try:
+                body.run(5)
+            except ZeroDivisionError:
+                continue
+            genomes.append(body.get_genome())
+            bodies.append(body)
+        else:
+            self.fail(f"only {len(bodies)} of {count} bodies could be run")
+        return genomes, bodies
+
+    def test1(self):
+        genomes, bodies = self.make_bodies(6)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bodies.snap')
+            save_bodies(path, bodies)
+            snapshot = load_snapshot(path)
+            self.assertEqual(len(snapshot), len(bodies))
+            self.assertIsInstance(snapshot.get_chemicals(), np.memmap)
+            for i, (genome, body) in enumerate(zip(genomes, bodies)):
+                decoder = DecoderLinkedList()
+                decoder.set_genome(genome)
+                restored = decoder.read_genome()
+                snapshot.restore_body(restored, i)
+                np.testing.assert_array_equal(restored.get_chemicals(), body.get_chemicals())
+                np.testing.assert_array_equal(restored.get_concentrations(), body.get_concentrations())
+                for organ, original in zip(restored.get_organs(), body.get_organs()):
+                    self.assertEqual(organ.get_params(), original.get_params())
+                    self.assertEqual(organ.get_receptor_totals(), original.get_receptor_totals())
+            del snapshot
+            with open(path, 'r+b') as file:
+                file.write(b'NOTASNAP')
+            self.assertRaises(ValueError, load_snapshot, path)
+
+    def test2(self):
+        _, bodies = self.make_bodies(6)
+        simulator = PopulationSimulator(bodies)
+        simulator.step()
+        other = PopulationSimulator(bodies)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'population.snap')
+            save_simulator(path, simulator)
+            snapshot = load_snapshot(path, mmap=False)
+            snapshot.restore_simulator(other)
+            del snapshot
+        for ours, theirs in zip(simulator.get_state(), other.get_state()):
+            np.testing.assert_array_equal(ours, theirs)
+
+class SimulatorTest(unittest.TestCase):
+    """
+    Test that stepping a population together matches stepping each Body on its own with the same activation rolls
+    """
+    def test1(self):
+        random.seed(SEED)
+        bodies = [random_body() for _ in range(20)]
+        simulator = PopulationSimulator(bodies)
+        rng = np.random.default_rng(SEED)
+        failed = [False] * len(bodies)
+        for _ in range(15):
+            rolls = rng.random(simulator.get_health().shape)
+            # Organs activate far more often with some rolls of 0
+            rolls[rng.random(rolls.shape) < .3] = 0
+            simulator.step(rolls)
+            for i, body in enumerate(bodies):
+                if failed[i]:
+                    continue
+                try:
+                    for organ, roll in zip(body.get_organs(), rolls[i]):
+                        if roll <= organ.get_act_rate():
+                            organ.activate_organ()
+                    body.calc_concentrations()
+                except ZeroDivisionError:
+                    failed[i] = True
+        self.assertEqual(failed, list(simulator.get_failed()))
+        for i, body in enumerate(bodies):
+            np.testing.assert_allclose(simulator.get_chemicals()[i], body.get_chemicals(), rtol=1e-12, atol=1e-12)
+            np.testing.assert_allclose(simulator.get_concentrations()[i], body.get_concentrations(), rtol=1e-12, atol=1e-12)
+            organs = body.get_organs()
+            np.testing.assert_allclose(simulator.get_health()[i, :len(organs)], [organ.get_health() for organ in organs], rtol=1e-12)
+            np.testing.assert_allclose(simulator.get_act_rates()[i, :len(organs)], [organ.get_act_rate() for organ in organs], rtol=1e-12)
+
+class NetworkTest(unittest.TestCase):
+    """
+    Test that a compiled organism keeps matching the organism it was compiled from, and that its stoichiometry matrix holds each reaction's equation
+    """
+    def test1(self):
+        random.seed(SEED)
+        rng = np.random.default_rng(SEED)
+        checked = 0
+        for _ in range(ATTEMPTS):
+            if checked == 10:
+                break
+            body = random_body()
+            network = compile_body(body, check=True)
+            try:
+                for _ in range(15):
+                    rolls = rng.random(len(body.get_organs()))
+                    rolls[rng.random(rolls.shape) < .3] = 0
+                    network.step(rolls)
+            except ZeroDivisionError:
+                continue
+            checked += 1
+        self.assertEqual(checked, 10)
+
+    def test2(self):
+        random.seed(SEED)
+        body = random_body(accept=reaction_genes)
+        reactions = reaction_genes(body)
+        stoichiometry = compile_body(body).get_stoichiometry()
+        self.assertEqual(stoichiometry.shape, (len(reactions), Chemicals.NUM_CHEMS))
+        for row, gene in zip(stoichiometry, reactions):
+            left = gene.get_equation_params()[0]
+            expected = np.zeros(Chemicals.NUM_CHEMS)
+            for c, (coefficient, chemical) in enumerate(gene.get_chems_and_coefficients()):
+                amount = coefficient * REACTION_MAX / 64
+                expected[chemical] += -amount if c < left else amount
+            np.testing.assert_allclose(row, expected)
+
+def random_body(rng=random, require_organs=True, accept=None):
+    """
+    Decodes random 4800 bit genomes until one gives a body with organs (unless require_organs is False) that accept(body) is true for, then adds up to 3 of each of the first 16 chemicals to it, drawn from rng. Fails after ATTEMPTS genomes
+    """
+    decoder = DecoderLinkedList()
+    for _ in range(ATTEMPTS):
+        decoder.set_genome(generate_genome(4800))
+        body = decoder.read_genome()
+        if require_organs and not body.get_organs():
+            continue
+        if accept is not None and not accept(body):
+            continue
+        for chemical in range(16):
+            body.add_chemical(chemical, rng.random() * 3)
+        body.calc_concentrations()
+        return body
+    raise AssertionError(f"none of {ATTEMPTS} random genomes gave a suitable body")
+
+def reaction_genes(body):
+    return [gene for organ in body.get_organs() for gene in organ.get_genes() if gene.get_type() == 'reaction']
+
+def original_health_decay(health, param):
+    """
+    health_decay as it was first written, recursion and all, to check the current one against
+    """
+    def smoothstep(x):
+        if x <= 0.0: return 0.0
+        if x >= 1.0: return 1.0
+        return 3 * x * x - 2 * x * x * x
+
+    def terrace(a, b, q=2.0):
+        param_p_one = COEF_ONE * b**.5 * P_ONE
+        param_p_two = COEF_TWO * b**.5 * P_TWO
+        L = max(0.0, param_p_one + Q_ONE * b)
+        M = min(1.0, param_p_two + Q_TWO * b)
+        a = a + V
+        if a <= b:
+            t = 0.0 if b <= 0.0 else smoothstep(a / b) ** R
+            return L * (1 - t) + b * t
+        elif b < a <= 1-V:
+            t = 0.0 if b >= 1.0 else smoothstep((a - b) / (1 - b)) ** R
+            return b * (1 - t) + M * t
+        else:
+            return terrace(1-V,b)
+
+    return terrace(param, health)
+
 def decode_x_times(decoder, times, genome_length = 400):
     """
     Helper function that generates random genomes x times of length j, returns 2 data sets
+    Counts come from the decoder's summary mode, so only the last genome is built into a creature (to describe it)
+    """
+    genomes = [generate_genome(genome_length) for j in range(times)]
+    rows = Constructor.summarize_genomes(genomes, decoder)
+    decoder.set_genome(genomes[-1])
+    decoder.read_genome().describe()
+    return summary_frames(rows)
+
+def summary_frames(rows):
+    """
+    Turns summary rows into the same 2 data sets analyze_organism and analyze_organs would give
     """
-    datum = []
-    organ_datum = []
-    df = pd.DataFrame()
-    for j in range(times):
-        rand_genes=generate_genome(genome_length)
-        decoder.set_genome(rand_genes)
-        new_creature = decoder.read_genome()
-        datum.append(analyze_organism(new_creature))
-        organ_datum = analyze_organs(new_creature,organ_datum)
-        if j == times-1:
-            new_creature.describe()
-    organ_df = pd.DataFrame(organ_datum, columns=['Organ Count'])
-    for row in datum:
-        new_row_df = pd.DataFrame([row])
-        df = pd.concat([df, new_row_df], ignore_index=True)
+    df = pd.DataFrame({'Organ Count': rows['organ_count'],
+                       'Gene Count': rows['gene_count'],
+                       'Average Genes per Organ': rows['gene_count'] / np.maximum(rows['organ_count'], 1)})
+    organ_datum = [row['genes'][:row['organ_count']] for row in rows]
+    organ_df = pd.DataFrame(np.concatenate(organ_datum) if organ_datum else [], columns=['Organ Count'])
     return df, organ_df
 
 def plot_row(df1, df2, col, axes):